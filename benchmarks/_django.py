@@ -0,0 +1,44 @@
+"""Shared setup for the benchmark scripts in this directory."""
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'note_project.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database(name=None):
+    """Run against a throwaway migrated database, like the test suite does.
+
+    SQLite test databases are in memory unless a file name is given; use one
+    when several threads write concurrently.
+    """
+    from django.db import connection
+    old_name = connection.settings_dict['NAME']
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = str(name)
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timeit(func, repeat=5, number=1):
+    """Best wall time in seconds of number calls, over repeat rounds"""
+    import time
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
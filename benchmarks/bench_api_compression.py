@@ -0,0 +1,61 @@
+"""
+CPU cost against bytes saved when gzipping note API payloads.
+
+For list payloads of 1 to 1000 notes, reports the compression time and the
+compressed size at each level, next to the middleware's minimum-size cutoff.
+
+    python benchmarks/bench_api_compression.py
+"""
+from _django import setup, timeit
+
+setup()
+
+import json  # noqa: E402
+import random  # noqa: E402
+
+from django.conf import settings  # noqa: E402
+
+from notes.middleware import compress_bytes  # noqa: E402
+
+WORDS = (
+    'meeting notes project deadline review draft idea list groceries travel plan budget '
+    'call follow up design sketch weekend book chapter summary research reading todo'
+).split()
+
+
+def make_payload(count):
+    rng = random.Random(count)
+    notes = [
+        {
+            'id': i,
+            'title': ' '.join(rng.choices(WORDS, k=5)),
+            'content': ' '.join(rng.choices(WORDS, k=rng.randint(20, 200))),
+            'author': 'bench',
+            'created_at': '2025-10-20T08:41:00.123456Z',
+            'updated_at': '2025-10-21T09:15:30.654321Z',
+        }
+        for i in range(count)
+    ]
+    return json.dumps(notes).encode()
+
+
+def main():
+    levels = (1, 6, 9)
+    print(f'min size cutoff: {settings.API_COMPRESSION_MIN_SIZE} bytes')
+    header = f"{'notes':>6} {'bytes':>10}"
+    for level in levels:
+        header += f" {'L%d bytes' % level:>10} {'L%d ms' % level:>8} {'L%d KB/ms' % level:>9}"
+    print(header)
+    for count in (1, 10, 100, 1000):
+        data = make_payload(count)
+        row = f'{count:>6} {len(data):>10}'
+        for level in levels:
+            size = len(compress_bytes(data, level))
+            seconds = timeit(lambda: compress_bytes(data, level), repeat=5, number=10)
+            saved_kb = (len(data) - size) / 1024
+            row += f' {size:>10} {seconds * 1000:>8.3f} {saved_kb / (seconds * 1000):>9.1f}'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Hot/cold tiering for a user with 50k notes, 90% of them not updated for
+over a year: on-disk size of the notes table (with its indexes, full-text
+index and duplicate-search index) and the archive, and list latency
+(first HTML page, and the unpaginated API list), before and after `archive_notes`.
+
+    python benchmarks/bench_archive.py
+"""
+import random
+
+from _django import setup, test_database, timeit
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from notes.archive import archive_stale_notes  # noqa: E402
+from notes.models import Note  # noqa: E402
+from notes.tasks import Worker  # noqa: E402
+
+NOTES = 50_000
+VOCABULARY = [f'word{i}' for i in range(3000)]
+
+
+def table_sizes():
+    """Bytes per group of tables, each with its indexes"""
+    groups = {
+        'notes table': ['notes_note'],
+        'full-text index': ['notes_note_fts%'],
+        'duplicate index': ['notes_notesignature', 'notes_notelshbucket'],
+        'archive': ['notes_archivednote'],
+    }
+    sizes = {}
+    with connection.cursor() as cursor:
+        for label, patterns in groups.items():
+            cursor.execute(
+                'SELECT COALESCE(SUM(d.pgsize), 0) FROM dbstat d JOIN sqlite_master m ON d.name = m.name '
+                f'WHERE {" OR ".join(["m.tbl_name LIKE %s"] * len(patterns))}',
+                patterns,
+            )
+            sizes[label] = cursor.fetchone()[0]
+    return sizes
+
+
+def measure(client, user):
+    def page():
+        cache.clear()
+        client.get(reverse('note_list'))
+
+    auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    def api_list():
+        client.get(reverse('drf_note_list'), **auth)
+
+    def scan():
+        return Note.objects.filter(author=user, content__icontains='word42 word7').count()
+
+    sizes = ', '.join(f'{label} {size / 2 ** 20:.1f} MB' for label, size in table_sizes().items())
+    print(f'  {sizes}')
+    print(f'  list page 1: {timeit(page, repeat=10) * 1000:.1f} ms')
+    print(f'  API list of all notes: {timeit(api_list, repeat=2) * 1000:.0f} ms')
+    print(f'  author content scan: {timeit(scan) * 1000:.1f} ms')
+
+
+def main():
+    rng = random.Random(3)
+    with test_database(), override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []},
+    ):
+        user = User.objects.create_user('bench', password='x')
+        for start in range(0, NOTES, 5000):
+            Note.objects.bulk_create(
+                Note(title=f'Note {start + i}', content=' '.join(rng.choices(VOCABULARY, k=80)), author=user)
+                for i in range(5000)
+            )
+        Worker(batch=50).run(burst=True)
+        with connection.cursor() as cursor:
+            # Nine notes in ten were last touched 400 to 765 days ago
+            cursor.execute(
+                "UPDATE notes_note SET updated_at = datetime('now', '-' || (400 + id % 365) || ' days') "
+                'WHERE id % 10 != 0'
+            )
+        client = Client()
+        client.force_login(user)
+
+        print('before:')
+        measure(client, user)
+        archived = archive_stale_notes(delay=0)
+        connection.cursor().execute('VACUUM')
+        print(f'after archiving {archived} notes:')
+        measure(client, user)
+
+
+if __name__ == '__main__':
+    main()
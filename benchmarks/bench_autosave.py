@@ -0,0 +1,80 @@
+"""
+Database writes for one editing session: an editor saving every few
+milliseconds through PUT note_detail versus the coalescing autosave
+endpoint.  The session is time-compressed: NOTE_AUTOSAVE_INTERVAL is scaled
+down by the same factor as the save cadence (300 ms saves, 5 s interval).
+
+    python benchmarks/bench_autosave.py
+"""
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from _django import setup, test_database
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from notes.autosave import drafts  # noqa: E402
+from notes.models import Note  # noqa: E402
+
+SAVES = 200
+SCALE = 100  # 300 ms between saves becomes 3 ms
+CADENCE = 0.3 / SCALE
+
+
+def session(client, url, auth):
+    for i in range(SAVES):
+        body = json.dumps({'title': 'Draft', 'content': 'word ' * (i + 1)})
+        client.put(url, body, content_type='application/json', **auth)
+        time.sleep(CADENCE)
+
+
+def count_updates(func):
+    updates = 0
+
+    def wrapper(execute, sql, params, many, context):
+        nonlocal updates
+        updates += sql.startswith('UPDATE "notes_note"')
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        func()
+    return updates
+
+
+def main():
+    # A file database: the autosave writer thread and the requests write concurrently
+    with tempfile.TemporaryDirectory() as tmp, test_database(Path(tmp) / 'db.sqlite3'), override_settings(
+        METRICS_STATE_FILE=Path(tmp) / 'metrics.bin', THROTTLE_STATE_FILE=Path(tmp) / 'throttle.bin',
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []},
+        NOTE_AUTOSAVE_INTERVAL=5 / SCALE,
+    ):
+        user = User.objects.create_user('bench', password='x')
+        note = Note.objects.create(title='Draft', content='', author=user)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        client = Client()
+
+        url = reverse('drf_note_detail', args=[note.pk])
+        writes = count_updates(lambda: session(client, url, auth))
+        print(f'PUT note_detail: {SAVES} saves, {writes} writes')
+
+        url = reverse('drf_note_autosave', args=[note.pk])
+        before = drafts.flushes
+        writes = count_updates(lambda: session(client, url, auth))
+        drafts.flush_all()
+        writes += drafts.flushes - before
+        print(f'autosave:        {SAVES} saves, {writes} writes')
+        note.refresh_from_db()
+        assert note.content == 'word ' * SAVES
+
+
+if __name__ == '__main__':
+    main()
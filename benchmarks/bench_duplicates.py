@@ -0,0 +1,61 @@
+"""
+Near-duplicate lookup for one note as the author's note count grows: the
+LSH bucket lookup in notes.similarity against comparing the note's
+signature with every other note's.  Also times signature computation with
+and without NumPy.
+
+    python benchmarks/bench_duplicates.py
+"""
+import random
+
+from _django import setup, test_database, timeit
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+
+from notes import similarity  # noqa: E402
+from notes.models import Note, NoteSignature  # noqa: E402
+from notes.tasks import Worker  # noqa: E402
+
+VOCABULARY = [f'w{i}' for i in range(5000)]
+
+
+def brute_force(note):
+    signature = similarity.decode(NoteSignature.objects.get(note=note).signature)
+    return [
+        note_id for note_id, other in NoteSignature.objects.filter(author_id=note.author_id)
+        .exclude(note_id=note.pk).values_list('note_id', 'signature')
+        if similarity.estimated_similarity(signature, similarity.decode(other)) >= 0.8
+    ]
+
+
+def main():
+    rng = random.Random(7)
+    text = ' '.join(rng.choices(VOCABULARY, k=300))
+    hashes = similarity.shingles(text)
+    if similarity.numpy is not None:
+        print(f'minhash, numpy:  {timeit(lambda: similarity.minhash(hashes), number=100) * 1000:.2f} ms')
+    numpy, similarity.numpy = similarity.numpy, None
+    print(f'minhash, python: {timeit(lambda: similarity.minhash(hashes), number=10) * 1000:.2f} ms')
+    similarity.numpy = numpy
+
+    with test_database():
+        user = User.objects.create_user('bench', password='x')
+        target = Note.objects.create(title='target', content=text, author=user)
+        Note.objects.create(title='copy', content=text + ' addendum', author=user)
+        total = 2
+        for size in (1000, 5000, 20000):
+            Note.objects.bulk_create(
+                Note(title='filler', content=' '.join(rng.choices(VOCABULARY, k=60)), author=user)
+                for _ in range(size - total)
+            )
+            Worker().run(burst=True)  # the signatures are computed by the task queue
+            total = size
+            lsh = timeit(lambda: similarity.similar_notes(target), number=20)
+            brute = timeit(lambda: brute_force(target), repeat=2)
+            print(f'{size:>6} notes: LSH {lsh * 1000:6.2f} ms, compare all {brute * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
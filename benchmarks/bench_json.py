@@ -0,0 +1,68 @@
+"""
+Serialize-and-render time for note list payloads of 1k and 10k notes.
+
+Compares DRF's stock path (datetimes formatted by the serializer, stdlib
+JSONRenderer) with notes.renderers.FastJSONRenderer, both with its stdlib
+fallback and with orjson when that is installed.
+
+    python benchmarks/bench_json.py
+"""
+from _django import setup, timeit
+
+setup()
+
+from datetime import timedelta  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from notes import fastjson  # noqa: E402
+from notes.models import Note  # noqa: E402
+from notes.renderers import FastJSONRenderer  # noqa: E402
+from notes.serializers import NoteSerializer  # noqa: E402
+
+
+class StdlibFastJSONRenderer(FastJSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return fastjson.stdlib_dumps(data)
+
+
+def make_notes(count):
+    author = User(pk=1, username='bench')
+    now = timezone.now()
+    return [
+        Note(
+            pk=i, author=author, title=f'Note {i}',
+            content='Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 4,
+            created_at=now - timedelta(days=i), updated_at=now - timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def bench(notes, renderer, datetime_format):
+    settings = {'DATETIME_FORMAT': datetime_format}
+    with override_settings(REST_FRAMEWORK=settings):
+        return timeit(lambda: renderer.render(NoteSerializer(notes, many=True).data), repeat=3)
+
+
+def main():
+    variants = [
+        ('drf JSONRenderer', JSONRenderer(), 'iso-8601'),
+        ('fast, stdlib', StdlibFastJSONRenderer(), None),
+    ]
+    if fastjson.orjson is not None:
+        variants.append(('fast, orjson', FastJSONRenderer(), None))
+    else:
+        print('orjson is not installed; skipping the orjson variant')
+    for count in (1000, 10000):
+        notes = make_notes(count)
+        for name, renderer, datetime_format in variants:
+            seconds = bench(notes, renderer, datetime_format)
+            print(f'{count:>6} notes  {name:<18} {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
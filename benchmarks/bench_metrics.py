@@ -0,0 +1,56 @@
+"""
+Cost of recording request metrics.
+
+Times notes.metrics.record() with the updates MetricsMiddleware makes for one
+request, and a GET of note_detail through the full middleware stack with and
+without MetricsMiddleware.
+
+    python benchmarks/bench_metrics.py
+"""
+import tempfile
+from pathlib import Path
+
+from _django import setup, test_database, timeit
+
+setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from notes import metrics  # noqa: E402
+from notes.models import Note  # noqa: E402
+
+REQUESTS = 500
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, test_database(), override_settings(
+        METRICS_STATE_FILE=Path(tmp) / 'metrics.bin', THROTTLE_STATE_FILE=Path(tmp) / 'throttle.bin',
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []},
+    ):
+        updates = [
+            (metrics.series('noteapp_http_requests_total', route='drf_note_detail', method='GET', status=200), 1),
+            *metrics.latency_updates('noteapp_http_request_duration_seconds', 0.004, route='drf_note_detail'),
+            (metrics.series('noteapp_db_queries_total', route='drf_note_detail'), 2),
+        ]
+        per_record = timeit(lambda: metrics.record(updates), number=10000)
+        print(f'record() per request: {per_record * 1e6:.1f} us')
+
+        user = User.objects.create_user('bench', password='x')
+        note = Note.objects.create(title='t', content='c' * 500, author=user)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        url = reverse('drf_note_detail', args=[note.pk])
+
+        without = [m for m in settings.MIDDLEWARE if m != 'notes.metrics.MetricsMiddleware']
+        for label, middleware in (('without metrics', without), ('with metrics', settings.MIDDLEWARE)):
+            with override_settings(MIDDLEWARE=middleware):
+                client = Client()
+                seconds = timeit(lambda: [client.get(url, **auth) for _ in range(REQUESTS)], repeat=3)
+            print(f'note_detail {label:>15}: {seconds / REQUESTS * 1e6:7.0f} us/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Render time of the note list page for 10, 50 and 200 cards.
+
+Compares a cold render (no cached card fragments), a warm render (every card
+served from the fragment cache) and a page cache hit.  The hit is timed two
+ways: the cache lookup including the note generation query behind its key
+(note_list_page_key), and a full GET through NoteListView.
+
+    python benchmarks/bench_note_list_render.py
+"""
+from _django import setup, test_database, timeit
+
+setup()
+
+from datetime import timedelta  # noqa: E402
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.contrib.messages.storage.cookie import CookieStorage  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from notes.cache import bump_note_generation, note_list_page_key  # noqa: E402
+from notes.models import Note  # noqa: E402
+from notes.views import NoteListView  # noqa: E402
+
+
+def make_notes(count, author):
+    now = timezone.now()
+    return [
+        Note(
+            pk=i, author=author, title=f'Note number {i} with a reasonably long title',
+            content='Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 8,
+            created_at=now, updated_at=now - timedelta(minutes=i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def view_hit(user):
+    request = RequestFactory().get('/')
+    request.user = user
+    request._messages = CookieStorage(request)
+    return NoteListView.as_view()(request)
+
+
+def main():
+    with test_database():
+        run()
+
+
+def run():
+    user = User.objects.create_user('bench', password='x')
+    bump_note_generation(user.pk)
+    request = RequestFactory().get('/')
+    request.user = user
+    print(f"{'cards':>6} {'cold ms':>9} {'warm ms':>9} {'page hit ms':>12} {'view hit ms':>12}")
+    for count in (10, 50, 200):
+        context = {'notes': make_notes(count, user), 'note_card_cache_timeout': 300}
+
+        def render():
+            return render_to_string('note_list.html', context, request)
+
+        def cold():
+            cache.clear()
+            render()
+
+        cold_time = timeit(cold, repeat=5, number=5)
+        render()
+        warm_time = timeit(render, repeat=5, number=5)
+        cache.set(note_list_page_key(user.pk, '1'), render().encode())
+        hit_time = timeit(lambda: cache.get(note_list_page_key(user.pk, '1')), repeat=5, number=100)
+        view_time = timeit(lambda: view_hit(user), repeat=5, number=100)
+        print(f'{count:>6} {cold_time * 1000:>9.2f} {warm_time * 1000:>9.2f} '
+              f'{hit_time * 1000:>12.3f} {view_time * 1000:>12.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Concurrent note write throughput against 1, 2, 4 and 8 SQLite shards.
+
+Each writer process inserts notes for random authors, one autocommit
+transaction per note as Django does, into the shard file its author maps to.
+This drives the sqlite3 module directly against the notes_note schema so the
+measurement is the database write lock rather than ORM overhead.
+
+Every note save also queues a duplicate-search task (notes/tasks.py), so the
+write is measured three ways: the note alone, the note plus a task row in
+the first database's queue, and the note plus a task row in the queue of
+its own shard, written in the same transaction.
+
+    python benchmarks/bench_shard_writes.py [writers] [notes_per_writer]
+"""
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+SCHEMA = (
+    'CREATE TABLE notes_note ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+    '"title" varchar(200) NOT NULL, "content" text NOT NULL, "created_at" datetime NOT NULL, '
+    '"updated_at" datetime NOT NULL, "author_id" integer NOT NULL)'
+)
+TASK_SCHEMA = (
+    'CREATE TABLE notes_task ("id" integer NOT NULL PRIMARY KEY AUTOINCREMENT, '
+    '"name" varchar(100) NOT NULL, "args" text NOT NULL, "status" varchar(10) NOT NULL, '
+    '"attempts" integer unsigned NOT NULL, "max_attempts" integer unsigned NOT NULL, '
+    '"run_at" datetime NOT NULL, "locked_until" datetime NULL, "locked_by" varchar(200) NOT NULL, '
+    '"last_error" text NOT NULL, "created_at" datetime NOT NULL)'
+)
+TASK_INDEX = 'CREATE INDEX notes_task_status_run_idx ON notes_task (status, run_at)'
+INSERT = (
+    'INSERT INTO notes_note (title, content, created_at, updated_at, author_id) '
+    "VALUES (?, ?, datetime('now'), datetime('now'), ?)"
+)
+INSERT_TASK = (
+    'INSERT INTO notes_task (name, args, status, attempts, max_attempts, run_at, locked_by, last_error, created_at) '
+    "VALUES ('notes.index_notes', ?, 'queued', 0, 5, datetime('now'), '', '', datetime('now'))"
+)
+MODES = ('note only', 'queue on first db', 'queue on shard')
+CONTENT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 10
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=60, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=DELETE')  # Django's SQLite default
+    return connection
+
+
+def writer(paths, count, seed, start, mode):
+    connections = [connect(p) for p in paths]
+    rng = random.Random(seed)
+    start.wait()
+    for i in range(count):
+        author_id = rng.randrange(1, 10000)
+        shard = connections[author_id % len(paths)]
+        if mode == 'note only':
+            shard.execute(INSERT, (f'note {i}', CONTENT, author_id))
+            continue
+        shard.execute('BEGIN')
+        note_id = shard.execute(INSERT, (f'note {i}', CONTENT, author_id)).lastrowid
+        args = f'[{author_id}, [{note_id}]]'
+        if mode == 'queue on shard':
+            shard.execute(INSERT_TASK, (args,))
+            shard.execute('COMMIT')
+        else:
+            shard.execute('COMMIT')
+            connections[0].execute(INSERT_TASK, (args,))
+
+
+def run(shards, writers, count, mode):
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [os.path.join(tmp, f'shard{i}.sqlite3') for i in range(shards)]
+        for path in paths:
+            connection = connect(path)
+            for statement in (SCHEMA, TASK_SCHEMA, TASK_INDEX):
+                connection.execute(statement)
+        start = multiprocessing.Event()
+        procs = [
+            multiprocessing.Process(target=writer, args=(paths, count, seed, start, mode))
+            for seed in range(writers)
+        ]
+        for proc in procs:
+            proc.start()
+        began = time.perf_counter()
+        start.set()
+        for proc in procs:
+            proc.join()
+        return writers * count / (time.perf_counter() - began)
+
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    print(f'{writers} writers x {count} notes, writes/s')
+    print(f"{'shards':>6}" + ''.join(f'{mode:>19}' for mode in MODES))
+    for shards in (1, 2, 4, 8):
+        rates = [run(shards, writers, count, mode) for mode in MODES]
+        print(f'{shards:>6}' + ''.join(f'{rate:>19.0f}' for rate in rates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Container boot cost: the old start.sh sequence (migrate, rebalance_note_shards
+--migrate-only, collectstatic) against prepare_startup, on a fresh data
+directory and on a restart with everything already in place.  prepare_startup
+includes the system checks, since the ASGI server start.sh runs does none.
+Also times `manage.py check` on its own and time-to-first-request of uvicorn
+serving note_project.asgi as start.sh does.
+
+Runs against a copy of the project in a temporary directory, so the real
+data/ and staticfiles/ are left alone.
+
+    python benchmarks/bench_startup.py
+"""
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from _django import BASE_DIR
+
+LEGACY = [
+    ['migrate', '--noinput'],
+    ['rebalance_note_shards', '--migrate-only'],
+    ['collectstatic', '--noinput'],
+]
+PREPARE = [['prepare_startup']]
+
+
+def manage(project, commands):
+    start = time.perf_counter()
+    for args in commands:
+        subprocess.run([sys.executable, 'manage.py', *args], cwd=project, check=True,
+                       stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def fresh_copy(root):
+    project = Path(tempfile.mkdtemp(dir=root))
+    shutil.copytree(BASE_DIR, project, dirs_exist_ok=True, ignore=shutil.ignore_patterns(
+        '.git', 'data', 'staticfiles', '__pycache__', '*.pyc'))
+    (project / 'data').mkdir()
+    return project
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(project):
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'note_project.asgi:application', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=project, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, 'DJANGO_DEBUG': 'False'},
+    )
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}/login/', timeout=5).read()
+                return time.perf_counter() - start
+            except urllib.error.HTTPError:
+                return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.005)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        for name, commands in (('legacy start.sh', LEGACY), ('prepare_startup', PREPARE)):
+            project = fresh_copy(root)
+            cold = manage(project, commands)
+            warm = min(manage(project, commands) for _ in range(3))
+            print(f'{name:>16}: fresh data {cold * 1000:7.0f} ms, restart {warm * 1000:7.0f} ms')
+
+        check = min(manage(project, [['check']]) for _ in range(3))
+        print(f'{"manage.py check":>16}: {check * 1000:7.0f} ms')
+        first = min(time_to_first_request(project) for _ in range(3))
+        print(f'{"first request":>16}: {first * 1000:7.0f} ms (uvicorn)')
+
+
+if __name__ == '__main__':
+    main()
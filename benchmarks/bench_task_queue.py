@@ -0,0 +1,85 @@
+"""
+Task queue throughput and latency on a SQLite file database: enqueueing one
+task per transaction and many in one, draining the queue with 1 and 4
+worker threads claiming 1 or 20 tasks at a time, and the delay from
+enqueue to the task starting with idle workers polling every 50 ms.
+
+    python benchmarks/bench_task_queue.py
+"""
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from _django import setup, test_database
+
+setup()
+
+from django.db import transaction  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from notes.models import Task  # noqa: E402
+from notes.tasks import enqueue, run_workers, task  # noqa: E402
+
+TASKS = 2000
+started = []
+
+
+@task('bench.noop')
+def noop(queued_at=None):
+    if queued_at is not None:
+        started.append(time.time() - queued_at)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def enqueue_many(count, atomic):
+    if atomic:
+        with transaction.atomic():
+            for _ in range(count):
+                enqueue('bench.noop')
+    else:
+        for _ in range(count):
+            enqueue('bench.noop')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, test_database(Path(tmp) / 'db.sqlite3'), override_settings(
+        TASK_QUEUE_EAGER=False,
+    ):
+        for atomic in (False, True):
+            elapsed = timed(lambda: enqueue_many(TASKS, atomic))
+            Task.objects.all().delete()
+            label = 'one transaction' if atomic else 'autocommit'
+            print(f'enqueue, {label:>15}: {TASKS / elapsed:8.0f} tasks/s')
+
+        for concurrency, batch in ((1, 1), (1, 20), (4, 1), (4, 20)):
+            enqueue_many(TASKS, atomic=True)
+            elapsed = timed(lambda: run_workers(concurrency, batch, burst=True))
+            assert not Task.objects.exists()
+            print(f'dequeue, {concurrency} threads x {batch:>2}: {TASKS / elapsed:8.0f} tasks/s')
+
+        stop = threading.Event()
+        workers = threading.Thread(target=run_workers, args=(4, 1, False, stop, 0.05))
+        workers.start()
+        for _ in range(200):
+            enqueue('bench.noop', time.time())
+            time.sleep(0.005)
+        while len(started) < 200:
+            time.sleep(0.05)
+        stop.set()
+        workers.join()
+        started.sort()
+        print(
+            f'enqueue to start: median {statistics.median(started) * 1000:.1f} ms, '
+            f'p95 {started[int(len(started) * 0.95)] * 1000:.1f} ms'
+        )
+
+
+if __name__ == '__main__':
+    main()
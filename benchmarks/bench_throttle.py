@@ -0,0 +1,45 @@
+"""
+Cost of one token-bucket check.
+
+Times notes.throttling.consume() for a client whose bucket exists, for
+clients rotating through 10000 buckets, and the empty lock/unlock of the
+shared table on its own, which is the floor for any check.
+
+    python benchmarks/bench_throttle.py
+"""
+import itertools
+import tempfile
+from pathlib import Path
+
+from _django import setup, timeit
+
+setup()
+
+from django.test import override_settings  # noqa: E402
+
+from notes.throttling import buckets, consume  # noqa: E402
+
+CHECKS = 20000
+RATE = '1000000/s'  # never runs out, so every check takes and writes a token
+
+
+def lock_only():
+    with buckets.locked():
+        pass
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, override_settings(THROTTLE_STATE_FILE=Path(tmp) / 'throttle.bin'):
+        consume('read:user:1', RATE)
+        keys = itertools.cycle([f'read:user:{i}' for i in range(10000)])
+        for label, check in (
+            ('lock and unlock only', lock_only),
+            ('consume, one client', lambda: consume('read:user:1', RATE)),
+            ('consume, 10000 clients', lambda: consume(next(keys), RATE)),
+        ):
+            seconds = timeit(check, number=CHECKS)
+            print(f'{label:>24}: {seconds * 1e6:5.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Title suggestion latency for a user with 100k notes: LIKE '%prefix%' on the
+title, the title_normalized index range scan, and the in-memory title cache
+(warm).
+
+    python benchmarks/bench_title_suggest.py
+"""
+import random
+import string
+
+from _django import setup, test_database, timeit
+
+setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from notes.models import Note  # noqa: E402
+from notes.suggest import query_suggestions, suggest_titles, title_cache  # noqa: E402
+
+NOTES = 100_000
+PREFIXES = ['a', 'mee', 'projec', 'zz', 'qxj']
+
+
+def random_title(rng):
+    words = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9))) for _ in range(rng.randint(1, 5))]
+    return ' '.join(words).capitalize()
+
+
+def main():
+    rng = random.Random(42)
+    with test_database():
+        user = User.objects.create_user('bench', password='x')
+        for start in range(0, NOTES, 5000):
+            Note.objects.bulk_create(
+                Note(title=random_title(rng), content='', author=user) for _ in range(5000)
+            )
+
+        def like(prefix):
+            return list(
+                Note.objects.filter(author=user, title__icontains=prefix)
+                .order_by('title').values_list('id', 'title')[:10]
+            )
+
+        with override_settings(NOTE_SUGGEST_CACHE_USERS=32):
+            title_cache.clear()
+            cold = timeit(lambda: suggest_titles(user.pk, 'a'), repeat=1)
+            print(f'title cache build: {cold * 1000:.1f} ms')
+            for prefix in PREFIXES:
+                print(
+                    f'{prefix!r:>9}: LIKE {timeit(lambda: like(prefix), repeat=3) * 1000:7.2f} ms, '
+                    f'index {timeit(lambda: query_suggestions(user.pk, prefix, 10), number=100) * 1000:6.3f} ms, '
+                    f'cache {timeit(lambda: suggest_titles(user.pk, prefix), number=100) * 1000:6.3f} ms'
+                )
+
+
+if __name__ == '__main__':
+    main()
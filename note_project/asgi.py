@@ -1,5 +1,8 @@
 """
 ASGI config for note_project project.
+
+The note change feed (notes.events) is served directly by this ASGI app,
+outside Django's request handling; everything else goes to Django.
 """
 
 import os
@@ -7,4 +10,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'note_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup so the notes app is loaded
+from django.conf import settings  # noqa: E402
+from notes.events import sse_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == settings.NOTE_EVENTS_PATH:
+        return await sse_application(scope, receive, send)
+    return await django_application(scope, receive, send)
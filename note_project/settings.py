@@ -12,7 +12,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-your-secret-key-here-change-in-production'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# start.sh turns it off so pages link the hashed, precompressed static files
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
 
 
 ALLOWED_HOSTS = []
@@ -35,12 +36,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'notes.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'notes.middleware.StaticAssetMiddleware',
+    'notes.throttling.ConcurrencyLimitMiddleware',
+    'notes.middleware.ApiCompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'notes.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -51,8 +57,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cache compiled templates in every environment, not just when DEBUG is off
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -82,6 +94,31 @@ DATABASES = {
     }
 }
 
+# Notes are spread over NOTES_SHARD_COUNT SQLite files by author; 'default'
+# is shard 0.  See notes/sharding.py and `manage.py rebalance_note_shards`.
+NOTES_SHARD_COUNT = int(os.environ.get('NOTES_SHARD_COUNT', '1'))
+NOTE_SHARDS = ['default'] + [f'notes_shard_{i}' for i in range(1, NOTES_SHARD_COUNT)]
+for alias in NOTE_SHARDS[1:]:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'data' / f'{alias}.sqlite3',
+    }
+DATABASE_ROUTERS = ['notes.routers.NoteShardRouter']
+NOTE_SHARD_MAP_TTL = 30  # seconds a process trusts its cached author -> shard lookups
+
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'noteapp',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Rendered note list pages (keyed on the user's note generation) and note cards
+NOTE_LIST_CACHE_TIMEOUT = 60 * 5
+NOTE_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,9 +150,38 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# collectstatic writes content-hashed copies plus precompressed .gz files;
+# notes.middleware.StaticAssetMiddleware serves them
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'notes.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+STATIC_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Batched note deletion (see notes/purge.py and `manage.py purge_users`)
+NOTE_PURGE_BATCH_SIZE = 1000
+NOTE_PURGE_BATCH_DELAY = 0.05  # seconds between batches, lets other writers take the lock
+
+# Gzip for API responses (see notes.middleware.ApiCompressionMiddleware)
+API_COMPRESSION_PREFIX = '/api/'
+API_COMPRESSION_MIN_SIZE = 1024  # bytes; smaller bodies gain little and cost a round of CPU
+API_COMPRESSION_LEVEL = 6
+
+# Server-Sent Events note change feed, served by note_project/asgi.py (see notes/events.py)
+NOTE_EVENTS_PATH = '/api/v1/notes/events/'
+NOTE_EVENTS_HEARTBEAT = 15  # seconds between keep-alive comments
+NOTE_EVENTS_RETRY_MS = 3000
+NOTE_EVENTS_HISTORY = 1000  # recent events kept for Last-Event-ID resume
+NOTE_EVENTS_BUFFER = 100  # undelivered events per connection before it must resync
+
 # Login/Logout URLs
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'note_list'
@@ -129,8 +195,76 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed when installed, see notes/fastjson.py
+    'DEFAULT_RENDERER_CLASSES': [
+        'notes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'notes.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Serializers hand datetimes to the renderer, which formats them itself
+    'DATETIME_FORMAT': None,
+    # Token buckets shared by all workers, see notes/throttling.py
+    'DEFAULT_THROTTLE_CLASSES': [
+        'notes.throttling.NoteRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'auth': '20/min',
+        'read': '600/min',
+        'write': '120/min',
+        'autosave': '600/min',
+    },
 }
 
+# Admission control (notes/throttling.py)
+THROTTLE_STATE_FILE = BASE_DIR / 'data' / 'throttle.bin'
+THROTTLE_SLOTS = 65536
+MAX_CONCURRENT_REQUESTS = 64  # per worker process
+CONCURRENCY_RETRY_AFTER = 1  # seconds
+
+# On-demand request profiling (notes/profiling.py); off unless a selector is set
+NOTE_PROFILE_PATHS = [p for p in os.environ.get('NOTE_PROFILE_PATHS', '').split(',') if p]
+NOTE_PROFILE_USERS = [u for u in os.environ.get('NOTE_PROFILE_USERS', '').split(',') if u]
+NOTE_PROFILE_SAMPLE_RATE = float(os.environ.get('NOTE_PROFILE_SAMPLE_RATE', '0'))
+NOTE_PROFILE_MODE = os.environ.get('NOTE_PROFILE_MODE', 'cprofile')  # or 'sample'
+NOTE_PROFILE_INTERVAL = 0.005  # seconds between stack samples
+NOTE_PROFILE_DIR = BASE_DIR / 'data' / 'profiles'
+NOTE_PROFILE_KEEP = 200
+
+# Coalescing autosave (notes/autosave.py): seconds between writes of one note
+NOTE_AUTOSAVE_INTERVAL = 5
+
+# Users whose sorted titles are kept in memory for suggestions (notes/suggest.py).
+# Off by default: the index answers in about a millisecond, while the cache is
+# rebuilt in full after every write to the user's notes.
+NOTE_SUGGEST_CACHE_USERS = 0
+
+# Minimum estimated content similarity (0-1) for notes to count as near-duplicates
+NOTE_SIMILARITY_THRESHOLD = 0.8
+
+# Background task queue (notes/tasks.py); run `manage.py run_worker` next to the server
+TASK_QUEUE_EAGER = False  # run tasks inline when they are queued, as the test suite does
+TASK_MAX_ATTEMPTS = 5
+TASK_VISIBILITY_TIMEOUT = 300  # seconds a claimed task is hidden from other workers, renewed while it runs
+TASK_RETRY_BACKOFF = 10  # seconds before the first retry, doubling for each one after
+TASK_RETRY_BACKOFF_MAX = 3600
+TASK_POLL_INTERVAL = 1  # seconds an idle worker waits before looking for tasks again
+
+# Hot/cold note tiers (notes/archive.py, `manage.py archive_notes`)
+NOTE_ARCHIVE_AFTER_DAYS = 365  # notes not updated for this long are archived
+NOTE_ARCHIVE_BATCH_SIZE = 500
+NOTE_ARCHIVE_BATCH_DELAY = 0.05  # seconds between batches, lets other writers take the lock
+NOTE_ARCHIVE_COMPRESSION_LEVEL = 6
+
+# Request metrics shared by all workers, scraped from /metrics (notes/metrics.py)
+METRICS_STATE_FILE = BASE_DIR / 'data' / 'metrics.bin'
+METRICS_SLOTS = 4096
+METRICS_SERIES_LENGTH = 120  # bytes per series name
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -1,11 +1,183 @@
-from django.contrib import admin
-from .models import Note
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.admin import UserAdmin
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from .archive import restore_note
+from .models import ArchivedNote, Note, NotePurge, Task
+from .pagination import EstimatedCountPaginator
+from .purge import delete_notes_in_batches, schedule_user_purge
+from .search import fts_available, matching_note_ids
+from .sharding import is_sharded, shard_for_author
+from .tasks import enqueue
+
+
+class AuthorAutocompleteFilter(admin.RelatedFieldListFilter):
+    """Author filter that looks users up as you type instead of listing them all"""
+    template = 'admin/notes/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.model_admin = model_admin
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def widget_html(self):
+        formfield = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site),
+            required=False,
+        )
+        return formfield.widget.render(
+            self.lookup_kwarg, self.lookup_val, attrs={'id': 'author-filter'}
+        )
 
 
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
+    """Notes admin.
+
+    With several note shards the unfiltered list and search only cover
+    'default'; filtering by author reads that author's shard, and a note's
+    change page finds it on any shard.
+    """
     list_display = ('title', 'author', 'created_at', 'updated_at')
-    list_filter = ('created_at', 'updated_at', 'author')
-    search_fields = ('title', 'content', 'author__username')
+    list_filter = ('created_at', 'updated_at', ('author', AuthorAutocompleteFilter))
+    list_select_related = ('author',)
+    search_fields = ('title', 'content', '=author__username')
+    search_help_text = 'Words in the title or content, or an exact username.'
+    autocomplete_fields = ('author',)
     readonly_fields = ('created_at', 'updated_at')
     ordering = ('-updated_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['delete_in_batches']
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(Note._meta.get_field('author'), self.admin_site).media
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        author_id = request.GET.get('author__id__exact', '')
+        if is_sharded() and author_id.isdigit():
+            return queryset.using(shard_for_author(int(author_id)))
+        return queryset
+
+    def get_object(self, request, object_id, from_field=None):
+        obj = super().get_object(request, object_id, from_field)
+        if obj is None and is_sharded() and from_field is None and str(object_id).isdigit():
+            for alias in settings.NOTE_SHARDS[1:]:
+                obj = self.get_queryset(request).using(alias).filter(pk=object_id).first()
+                if obj is not None:
+                    break
+        return obj
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term or not fts_available(connections[queryset.db]):
+            return super().get_search_results(request, queryset, search_term)
+        # Full-text index for title/content, unique index for the username
+        return queryset.filter(
+            Q(pk__in=matching_note_ids(search_term)) | Q(author__username=search_term)
+        ), False
+
+    def get_actions(self, request):
+        # delete_selected loads every selected note and its related rows; delete_in_batches doesn't
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_queryset(self, request, queryset):
+        delete_notes_in_batches(queryset, delay=0)
+
+    @admin.action(description='Delete selected notes in batches', permissions=['delete'])
+    def delete_in_batches(self, request, queryset):
+        deleted = delete_notes_in_batches(queryset, delay=0)
+        self.message_user(request, f'Deleted {deleted} notes.', messages.SUCCESS)
+
+
+@admin.register(NotePurge)
+class NotePurgeAdmin(admin.ModelAdmin):
+    list_display = ('username', 'notes_deleted', 'created_at', 'updated_at', 'completed_at')
+    readonly_fields = ('user', 'username', 'notes_deleted', 'created_at', 'updated_at', 'completed_at')
+
+
+@admin.register(ArchivedNote)
+class ArchivedNoteAdmin(admin.ModelAdmin):
+    list_display = ('title', 'author', 'updated_at', 'archived_at')
+    list_select_related = ('author',)
+    readonly_fields = ('author', 'title', 'created_at', 'updated_at', 'archived_at')
+    exclude = ('content',)
+    actions = ['restore']
+
+    @admin.action(description='Move selected notes back to the notes table')
+    def restore(self, request, queryset):
+        for archived in queryset:
+            restore_note(archived)
+        self.message_user(request, f'Restored {len(queryset)} notes.', messages.SUCCESS)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """The queue on 'default'; with NOTE_SHARDS each shard's queue is in its own database"""
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('name', 'args', 'attempts', 'locked_until', 'locked_by', 'last_error', 'created_at')
+    actions = ['retry']
+
+    @admin.action(description='Retry selected tasks now')
+    def retry(self, request, queryset):
+        retried = queryset.filter(status=Task.FAILED).update(
+            status=Task.QUEUED, attempts=0, run_at=timezone.now(), locked_until=None,
+        )
+        self.message_user(request, f'Queued {retried} failed tasks again.', messages.SUCCESS)
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class NoteUserAdmin(UserAdmin):
+    """Deleting a user disables it and purges its notes in batches instead of one big cascade"""
+    actions = ['schedule_purge']
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        # The default collects (and lists) every note the users own just to confirm
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        summary = [f'{obj} (disabled now, notes deleted in the background)' for obj in objs]
+        return summary, {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.purge([obj])
+
+    def delete_queryset(self, request, queryset):
+        self.purge(queryset)
+
+    def purge(self, users):
+        for user in users:
+            purge = schedule_user_purge(user)
+            enqueue('notes.purge_user', purge.pk)
+
+    @admin.action(description='Disable selected users and purge their notes', permissions=['delete'])
+    def schedule_purge(self, request, queryset):
+        self.purge(queryset)
+        self.message_user(
+            request,
+            f'Disabled {len(queryset)} users; their notes are being deleted in the background.',
+            messages.SUCCESS,
+        )
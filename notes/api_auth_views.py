@@ -1,20 +1,19 @@
-from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import User
-from rest_framework_simplejwt.tokens import RefreshToken
-from .utils import get_tokens_for_user, token_response, error_response
+from .utils import get_tokens_for_user, token_response, error_response, json_response, parse_json
 from .forms import UserRegistrationForm
-import json
+from .throttling import throttle
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@throttle('auth')
 def api_register(request):
     """JWT API endpoint for user registration"""
     try:
-        data = json.loads(request.body)
+        data = parse_json(request)
         # Convert password_confirm to password2 for Django form
         if 'password_confirm' in data:
             data['password2'] = data.pop('password_confirm')
@@ -37,17 +36,18 @@ def api_register(request):
             errors = {}
             for field, field_errors in form.errors.items():
                 errors[field] = [str(error) for error in field_errors]
-            return JsonResponse({'error': 'Registration failed', 'details': errors}, status=400)
+            return json_response({'error': 'Registration failed', 'details': errors}, status=400)
     except Exception as e:
         return error_response('Invalid JSON data', 400)
 
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@throttle('auth')
 def api_login(request):
     """JWT API endpoint for user login"""
     try:
-        data = json.loads(request.body)
+        data = parse_json(request)
         username = data.get('username')
         password = data.get('password')
         
@@ -74,14 +74,15 @@ def api_login(request):
 @require_http_methods(["POST"])
 def api_logout(request):
     """JWT API endpoint for user logout"""
+    from rest_framework_simplejwt.tokens import RefreshToken
     try:
-        data = json.loads(request.body)
+        data = parse_json(request)
         refresh_token = data.get('refresh')
         if refresh_token:
             try:
                 token = RefreshToken(refresh_token)
                 token.blacklist()
-                return JsonResponse({'message': 'Logout successful'})
+                return json_response({'message': 'Logout successful'})
             except Exception as e:
                 return error_response('Invalid token', 400)
         else:
@@ -92,16 +93,18 @@ def api_logout(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@throttle('auth')
 def api_refresh_token(request):
     """JWT API endpoint for token refresh"""
+    from rest_framework_simplejwt.tokens import RefreshToken
     try:
-        data = json.loads(request.body)
+        data = parse_json(request)
         refresh_token = data.get('refresh')
         
         if refresh_token:
             try:
                 token = RefreshToken(refresh_token)
-                return JsonResponse({
+                return json_response({
                     'access': str(token.access_token),
                     'refresh': str(token)
                 })
@@ -1,21 +1,31 @@
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.http import FileResponse
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
     NoteSerializer,
     UserSerializer
 )
+from .archive import NoteTiers, get_note
+from .autosave import drafts
 from .models import Note
+from .profiling import list_profiles
+from .similarity import similar_notes
+from .suggest import suggest_titles
+from .throttling import AuthRateThrottle, AutosaveRateThrottle
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
+    throttle_classes = [AuthRateThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
@@ -31,6 +41,7 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([AuthRateThrottle])
 def register_view(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
@@ -68,7 +79,7 @@ def user_profile(request):
 @permission_classes([IsAuthenticated])
 def note_list_create(request):
     if request.method == 'GET':
-        notes = Note.objects.filter(author=request.user)
+        notes = drafts.apply(list(NoteTiers(request.user)))
         serializer = NoteSerializer(notes, many=True)
         return Response(serializer.data)
     
@@ -84,21 +95,119 @@ def note_list_create(request):
 @permission_classes([IsAuthenticated])
 def note_detail(request, pk):
     try:
-        note = Note.objects.get(pk=pk, author=request.user)
+        # Changing an archived note moves it back into the notes table first
+        note = get_note(request.user.pk, pk, restore=request.method != 'GET')
     except Note.DoesNotExist:
         return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
+        drafts.apply([note])
         serializer = NoteSerializer(note)
         return Response(serializer.data)
 
     elif request.method == 'PUT':
         serializer = NoteSerializer(note, data=request.data)
         if serializer.is_valid():
+            # An explicit save supersedes any autosaved draft
+            drafts.discard(note.pk)
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
+        drafts.discard(note.pk)
         note.delete()
         return Response({'message': 'Note deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def note_suggest(request):
+    """Notes whose title starts with ?prefix=, ignoring case and accents"""
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), 50)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    matches = suggest_titles(request.user.pk, request.query_params.get('prefix', ''), max(limit, 0))
+    return Response([{'id': note_id, 'title': title} for note_id, title in matches])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def note_similar(request, pk):
+    """The user's notes that are near-duplicates of this one, most similar first"""
+    try:
+        note = get_note(request.user.pk, pk)
+    except Note.DoesNotExist:
+        return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        threshold = float(request.query_params.get('threshold', settings.NOTE_SIMILARITY_THRESHOLD))
+    except ValueError:
+        return Response({'error': 'threshold must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    matches = similar_notes(note, threshold)
+    titles = dict(
+        Note.objects.filter(author=request.user, pk__in=[note_id for _, note_id in matches])
+        .values_list('pk', 'title')
+    )
+    return Response([
+        {'id': note_id, 'title': titles[note_id], 'similarity': similarity}
+        for similarity, note_id in matches if note_id in titles
+    ])
+
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([AutosaveRateThrottle])
+def note_autosave(request, pk):
+    """Accept an editor draft; it is written to the database later, see notes/autosave.py"""
+    data = request.data if isinstance(request.data, dict) else {}
+    fields = {name: data[name] for name in ('title', 'content') if name in data}
+    max_title = Note._meta.get_field('title').max_length
+    valid = fields and all(isinstance(value, str) for value in fields.values())
+    if not valid or len(fields.get('title', '')) > max_title:
+        return Response(
+            {'error': f'Send a title (at most {max_title} characters) and/or content as strings'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if drafts.owner(pk) != request.user.pk and not Note.objects.filter(pk=pk, author=request.user).exists():
+        try:
+            get_note(request.user.pk, pk, restore=True)
+        except Note.DoesNotExist:
+            return Response({'error': 'Note not found'}, status=status.HTTP_404_NOT_FOUND)
+    drafts.stash(pk, request.user.pk, fields)
+    return Response({'id': pk, 'status': 'pending'}, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def note_events(request):
+    """Placeholder for the SSE feed when not running under ASGI"""
+    return Response(
+        {'error': 'The note event stream is only available when served through note_project.asgi'},
+        status=status.HTTP_501_NOT_IMPLEMENTED,
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_dump_list(request):
+    """Request profiles written by ProfilingMiddleware, newest first"""
+    return Response([
+        {
+            'name': entry.name,
+            'size': entry.stat().st_size,
+            'created_at': entry.stat().st_mtime,
+        }
+        for entry in list_profiles()
+    ])
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_dump_download(request, name):
+    # Only names from the listing are served, so the path cannot escape the directory
+    entry = next((e for e in list_profiles() if e.name == name), None)
+    if entry is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(open(entry.path, 'rb'), as_attachment=True, filename=entry.name,
+                        content_type='application/octet-stream')
@@ -0,0 +1,168 @@
+"""
+Hot/cold note tiers.
+
+Notes whose updated_at is older than NOTE_ARCHIVE_AFTER_DAYS are moved by
+`manage.py archive_notes` into ArchivedNote on the same shard: same id,
+title and timestamps, content zlib-compressed.  The notes table and its
+indexes then only hold notes that are still in use, which keeps
+author-scoped scans (counts, suggestions, duplicate search, full-text
+search) small.  Each batch is one short transaction and an interrupted run
+simply resumes.  The full-text index is compacted once a run is done.
+
+Reads fall back to the archive: NoteTiers lists an author's hot and
+archived notes as one sequence, newest update first, and get_note() finds a
+note in either table.  Any write to an archived note first restores it to
+the notes table (restore_note), where it is re-indexed for duplicate search
+and full-text search.
+"""
+import heapq
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_note_generation
+from .models import ArchivedNote, Note, NoteLSHBucket, NoteSignature
+from .search import optimize_note_fts
+
+
+def compress(content):
+    return zlib.compress(content.encode(), settings.NOTE_ARCHIVE_COMPRESSION_LEVEL)
+
+
+def as_note(archived):
+    """An unsaved-looking Note with the archived note's fields, for reading"""
+    note = Note(
+        id=archived.id, author_id=archived.author_id, title=archived.title,
+        content=zlib.decompress(bytes(archived.content)).decode(),
+        created_at=archived.created_at, updated_at=archived.updated_at,
+    )
+    note._state.adding = False
+    note._state.db = archived._state.db
+    return note
+
+
+def archive_stale_notes(days=None, batch_size=None, delay=None, on_batch=None):
+    """Move notes not updated for days into the archive, batch_size per transaction.
+
+    Returns the number of notes archived.
+    """
+    if days is None:
+        days = settings.NOTE_ARCHIVE_AFTER_DAYS
+    if batch_size is None:
+        batch_size = settings.NOTE_ARCHIVE_BATCH_SIZE
+    if delay is None:
+        delay = settings.NOTE_ARCHIVE_BATCH_DELAY
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    for db in settings.NOTE_SHARDS:
+        stale = Note.objects.using(db).filter(updated_at__lt=cutoff).order_by('pk')
+        archived = 0
+        while True:
+            with transaction.atomic(using=db):
+                # Read inside the transaction so an edit can't land between the copy and the delete
+                rows = list(stale.values_list('pk', 'author_id', 'title', 'content', 'created_at', 'updated_at')[:batch_size])
+                if not rows:
+                    break
+                ArchivedNote.objects.using(db).bulk_create([
+                    ArchivedNote(id=pk, author_id=author_id, title=title, content=compress(content),
+                                 created_at=created_at, updated_at=updated_at)
+                    for pk, author_id, title, content, created_at, updated_at in rows
+                ])
+                pks = [row[0] for row in rows]
+                # Like delete_notes_in_batches: no collector, and no note.deleted
+                # events since the notes are still there to read
+                for model in (NoteLSHBucket, NoteSignature):
+                    model.objects.using(db).filter(note_id__in=pks)._raw_delete(db)
+                Note.objects.using(db).filter(pk__in=pks)._raw_delete(db)
+            for author_id in {row[1] for row in rows}:
+                bump_note_generation(author_id)
+            archived += len(rows)
+            if on_batch:
+                on_batch(db, len(rows))
+            if len(rows) < batch_size:
+                break
+            if delay:
+                time.sleep(delay)
+        if archived:
+            optimize_note_fts(db)
+        total += archived
+    return total
+
+
+def restore_note(archived):
+    """Move an archived note back into the notes table; returns the Note"""
+    db = archived._state.db
+    note = as_note(archived)
+    note._state.adding = True
+    with transaction.atomic(using=db):
+        # bulk_create also queues duplicate-search indexing
+        Note.objects.using(db).bulk_create([note])
+        # Undo the auto_now stamps: restoring is not an edit
+        Note.objects.using(db).filter(pk=note.pk).update(created_at=archived.created_at, updated_at=archived.updated_at)
+        ArchivedNote.objects.using(db).filter(pk=archived.pk).delete()
+    note.created_at, note.updated_at = archived.created_at, archived.updated_at
+    note._state.adding = False
+    bump_note_generation(note.author_id)
+    return note
+
+
+def get_note(author_id, pk, restore=False):
+    """The author's note pk from the notes table, else from the archive.
+
+    With restore an archived note is moved back first, for callers about to
+    change it.  Raises Note.DoesNotExist.
+    """
+    try:
+        return Note.objects.get(pk=pk, author_id=author_id)
+    except Note.DoesNotExist:
+        archived = ArchivedNote.objects.filter(pk=pk, author_id=author_id).first()
+        if archived is None:
+            raise
+    return restore_note(archived) if restore else as_note(archived)
+
+
+class NoteTiers:
+    """An author's hot and archived notes as one list, newest update first.
+
+    Paginators and templates use it like a queryset: slicing reads only as
+    many rows from each table as the end of the slice and merges them.
+    """
+
+    def __init__(self, author):
+        self.author = author
+        self.author_id = author.pk
+
+    def count(self):
+        return (
+            Note.objects.filter(author_id=self.author_id).count()
+            + ArchivedNote.objects.filter(author_id=self.author_id).count()
+        )
+
+    def __len__(self):
+        return self.count()
+
+    def _merged(self, stop=None):
+        hot = Note.objects.filter(author_id=self.author_id).order_by('-updated_at')
+        cold = ArchivedNote.objects.filter(author_id=self.author_id).order_by('-updated_at')
+        if stop is not None:
+            hot, cold = hot[:stop], cold[:stop]
+        cold = (as_note(archived) for archived in cold)
+        for note in heapq.merge(hot, cold, key=lambda note: note.updated_at, reverse=True):
+            # Every note has the same author; spares serializers a query per note
+            note.author = self.author
+            yield note
+
+    def __iter__(self):
+        return self._merged()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None or (index.start or 0) < 0 or (index.stop or 0) < 0:
+                raise ValueError('NoteTiers supports plain non-negative slices only')
+            merged = self._merged(index.stop)
+            return list(merged)[index.start:index.stop]
+        return self[index:index + 1][0]
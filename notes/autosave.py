@@ -0,0 +1,155 @@
+"""
+Coalescing autosave.
+
+The editor sends drafts every few hundred milliseconds; nearly all of them
+are overwritten before anyone reads them.  Drafts are kept in memory, one
+per note, and a background thread writes a note at most once per
+NOTE_AUTOSAVE_INTERVAL seconds.  An explicit PUT or DELETE of the note
+discards its draft, and whatever is pending is written at interpreter exit.
+
+A flush stores the draft with updated_at set to when the draft was received
+and only if the row is older than that.  So with several worker processes,
+an older draft held by one worker never overwrites a newer draft or an
+explicit save that another worker already wrote.  Reads only see drafts
+held by the worker that serves them.
+"""
+import atexit
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from .cache import bump_note_generation
+from .events import broker
+from .models import Note
+from .suggest import normalize_title
+from .tasks import enqueue
+
+
+@dataclass
+class Draft:
+    author_id: int
+    fields: dict = field(default_factory=dict)
+    received_at: object = None  # aware datetime of the latest change
+    pending_since: float = 0.0  # monotonic time the first unflushed change arrived
+
+
+class DraftBuffer:
+    def __init__(self):
+        self._drafts = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.flushes = 0
+
+    def stash(self, note_id, author_id, fields):
+        """Record a draft for the note; the background writer stores it later"""
+        with self._lock:
+            draft = self._drafts.get(note_id)
+            if draft is None:
+                draft = self._drafts[note_id] = Draft(author_id, pending_since=time.monotonic())
+            draft.fields.update(fields)
+            draft.received_at = timezone.now()
+            self._ensure_writer()
+
+    def owner(self, note_id):
+        """Author id of the note if it has a pending draft"""
+        draft = self._drafts.get(note_id)
+        return draft.author_id if draft else None
+
+    def pending_for(self, author_id):
+        """Whether any of the author's notes has a draft held by this process"""
+        with self._lock:
+            return any(draft.author_id == author_id for draft in self._drafts.values())
+
+    def apply(self, notes):
+        """Overlay pending drafts onto note instances; returns notes for chaining.
+
+        updated_at becomes the draft's, as it will be once written, so
+        anything keyed on it (such as the note card fragments) is fresh.
+        """
+        with self._lock:
+            if not self._drafts:
+                return notes
+            for note in notes:
+                draft = self._drafts.get(note.pk)
+                if draft is not None:
+                    for name, value in draft.fields.items():
+                        setattr(note, name, value)
+                    note.updated_at = draft.received_at
+        return notes
+
+    def discard(self, note_id):
+        with self._lock:
+            self._drafts.pop(note_id, None)
+
+    def flush_due(self, now=None, force=False):
+        """Write drafts that have waited at least NOTE_AUTOSAVE_INTERVAL (all if force).
+
+        Returns the number of notes updated.
+        """
+        now = time.monotonic() if now is None else now
+        interval = settings.NOTE_AUTOSAVE_INTERVAL
+        with self._lock:
+            due = {
+                note_id: draft for note_id, draft in self._drafts.items()
+                if force or now - draft.pending_since >= interval
+            }
+            for note_id in due:
+                del self._drafts[note_id]
+        written = 0
+        for note_id, draft in due.items():
+            try:
+                written += self._write(note_id, draft)
+            except DatabaseError:
+                # Put it back under any newer changes and retry on the next pass
+                with self._lock:
+                    newer = self._drafts.get(note_id)
+                    if newer is None:
+                        self._drafts[note_id] = draft
+                    else:
+                        newer.fields = {**draft.fields, **newer.fields}
+                        newer.pending_since = draft.pending_since
+        return written
+
+    def flush_all(self):
+        return self.flush_due(force=True)
+
+    def _write(self, note_id, draft):
+        queryset = Note.objects.filter(pk=note_id, author_id=draft.author_id)
+        fields = dict(draft.fields)
+        if 'title' in fields:
+            fields['title_normalized'] = normalize_title(fields['title'])
+        with transaction.atomic(using=queryset.db):
+            updated = queryset.filter(updated_at__lt=draft.received_at).update(
+                updated_at=draft.received_at, **fields,
+            )
+            if updated:
+                if 'content' in fields:
+                    enqueue('notes.index_notes', draft.author_id, [note_id], using=queryset.db)
+                bump_note_generation(draft.author_id)
+                data = {'id': note_id, **draft.fields, 'updated_at': draft.received_at}
+                data.pop('content', None)
+                transaction.on_commit(
+                    lambda: broker.publish(draft.author_id, 'note.updated', data), using=queryset.db,
+                )
+        self.flushes += updated
+        return updated
+
+    def _ensure_writer(self):
+        # Called with the lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='note-autosave', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(min(1.0, settings.NOTE_AUTOSAVE_INTERVAL / 4))
+            self.flush_due()
+            close_old_connections()
+
+
+drafts = DraftBuffer()
+atexit.register(drafts.flush_all)
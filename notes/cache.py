@@ -0,0 +1,45 @@
+"""
+Per-user note generation counters.
+
+Every write to a user's notes bumps their generation, so cache entries keyed
+on it (such as the rendered note list pages) go stale without having to be
+found and deleted.  The counter is a NoteGeneration row on the author's
+shard rather than a cache entry: the cache is per process, and writes made
+by other processes (the task worker, management commands, other servers)
+must invalidate this process's pages too.  Bumps set the counter to at
+least the current time in nanoseconds, so it never returns to a value old
+cache entries were keyed on, even after the row moves between shards.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Greatest
+
+
+def note_generation(user_id):
+    from .models import NoteGeneration
+
+    generation = (
+        NoteGeneration.objects.filter(author_id=user_id).values_list('generation', flat=True).first()
+    )
+    return generation or 0
+
+
+def bump_note_generation(user_id):
+    from .models import NoteGeneration
+
+    queryset = NoteGeneration.objects.filter(author_id=user_id)
+    now = time.time_ns()
+    bumped = Greatest(F('generation') + 1, Value(now), output_field=BigIntegerField())
+    if queryset.update(generation=bumped):
+        return
+    try:
+        with transaction.atomic(using=queryset.db):
+            queryset.create(author_id=user_id, generation=now)
+    except IntegrityError:
+        queryset.update(generation=bumped)
+
+
+def note_list_page_key(user_id, page):
+    return f'notes:list:{user_id}:{note_generation(user_id)}:{page}'
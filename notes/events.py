@@ -0,0 +1,287 @@
+"""
+Server-Sent Events feed of note changes.
+
+Note signals publish created/updated/deleted events into an in-process
+broker that fans them out to the connected clients of the note's author.
+The feed itself is a plain ASGI app mounted by note_project/asgi.py rather
+than a Django view: each connection is one coroutine waiting on an
+asyncio.Event, so idle connections cost no threads, and it notices client
+disconnects, which Django 4.2's streaming responses do not.
+
+Event ids are "<epoch>-<seq>".  A client reconnecting with Last-Event-ID
+gets the events it missed from the broker's bounded history; if those are
+gone (or were published by a previous process) it receives a "reset" event
+and should refetch its notes.  A client that falls more than the buffer
+size behind is handled the same way.
+
+Being outside Django, the feed doesn't pass through CorsMiddleware, so it
+adds the CORS headers itself for the origins django-cors-headers allows
+(CORS_ALLOWED_ORIGINS and friends); browsers' EventSource needs them
+when the frontend is served from another origin.
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from corsheaders.conf import conf as cors_conf
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.db import close_old_connections
+
+from .fastjson import dumps
+
+
+class NoteEvent:
+    __slots__ = ('seq', 'user_id', 'type', 'data')
+
+    def __init__(self, seq, user_id, type, data):
+        self.seq = seq
+        self.user_id = user_id
+        self.type = type
+        self.data = data
+
+
+class Subscription:
+    def __init__(self, user_id, loop, buffer_size):
+        self.user_id = user_id
+        self.loop = loop
+        self.buffer_size = buffer_size
+        self.pending = deque()
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def push(self, event):
+        # Runs on the subscription's event loop
+        if len(self.pending) >= self.buffer_size:
+            self.pending.clear()
+            self.overflowed = True
+        else:
+            self.pending.append(event)
+        self.ready.set()
+
+    def drain(self):
+        events = list(self.pending)
+        self.pending.clear()
+        self.ready.clear()
+        return events
+
+    async def wait(self, timeout, disconnected=None):
+        """Wait for events, the timeout, or the disconnected future; return the events"""
+        if not self.pending and not self.overflowed:
+            waiter = asyncio.ensure_future(self.ready.wait())
+            waiting = {waiter} if disconnected is None else {waiter, disconnected}
+            try:
+                await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiter.cancel()
+        return self.drain()
+
+
+class NoteEventBroker:
+    """Thread-safe fan-out of note events to asyncio subscribers"""
+
+    def __init__(self, history_size=1000, buffer_size=100):
+        self.epoch = str(time.time_ns())
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = defaultdict(set)
+
+    def event_id(self, event):
+        return f'{self.epoch}-{event.seq}'
+
+    def publish(self, user_id, type, data):
+        with self._lock:
+            self._seq += 1
+            event = NoteEvent(self._seq, user_id, type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+        return event
+
+    def subscribe(self, user_id, loop, last_event_id=None):
+        """Register a subscriber; return it with the missed events to replay.
+
+        The backlog is None when the missed events can't be replayed and the
+        client has to resync.
+        """
+        subscription = Subscription(user_id, loop, self.buffer_size)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+            backlog = []
+            if last_event_id:
+                backlog = self._replay(user_id, last_event_id)
+        return subscription, backlog
+
+    def _replay(self, user_id, last_event_id):
+        epoch, _, seq = last_event_id.partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self._history and self._history[0].seq > seq + 1:
+            return None
+        return [e for e in self._history if e.seq > seq and e.user_id == user_id]
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broker = NoteEventBroker(settings.NOTE_EVENTS_HISTORY, settings.NOTE_EVENTS_BUFFER)
+
+
+def format_event(event):
+    return (
+        f'id: {broker.event_id(event)}\nevent: {event.type}\ndata: '.encode()
+        + dumps(event.data)
+        + b'\n\n'
+    )
+
+
+RESET_EVENT = b'event: reset\ndata: {}\n\n'
+HEARTBEAT = b': ping\n\n'
+
+
+def authenticate_token(raw_token):
+    """Return the user id for a JWT access token, or None"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    auth = JWTAuthentication()
+    # This runs outside Django's request cycle, which normally recycles connections
+    close_old_connections()
+    try:
+        user = auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    finally:
+        close_old_connections()
+    return user.pk
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def _raw_token(scope):
+    parts = (_header(scope, b'authorization') or '').split()
+    if len(parts) == 2 and parts[0] in settings.SIMPLE_JWT['AUTH_HEADER_TYPES']:
+        return parts[1]
+    # EventSource can't set headers, so browsers pass the token in the query string
+    return parse_qs(scope['query_string'].decode('latin-1')).get('token', [None])[0]
+
+
+_cors = CorsMiddleware(lambda request: None)
+
+
+def _cors_headers(scope):
+    """Response headers letting an allowed origin read the response, as CorsMiddleware sets them"""
+    headers = [(b'vary', b'origin')]
+    origin = _header(scope, b'origin')
+    if not origin:
+        return headers
+    try:
+        url = urlsplit(origin)
+    except ValueError:
+        return headers
+    if not cors_conf.CORS_ALLOW_ALL_ORIGINS and not _cors.origin_found_in_white_lists(origin, url):
+        return headers
+    if cors_conf.CORS_ALLOW_ALL_ORIGINS and not cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-origin', b'*'))
+    else:
+        headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+    if cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+def _last_event_id(scope):
+    last_event_id = _header(scope, b'last-event-id')
+    if last_event_id is not None:
+        return last_event_id
+    return parse_qs(scope['query_string'].decode('latin-1')).get('last_event_id', [None])[0]
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _send_json(send, status, data, headers=()):
+    body = dumps(data)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()), *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def sse_application(scope, receive, send):
+    """ASGI app streaming the authenticated user's note events"""
+    cors_headers = _cors_headers(scope)
+    if scope['method'] != 'GET':
+        return await _send_json(send, 405, {'error': 'Method not allowed'}, cors_headers)
+    raw_token = _raw_token(scope)
+    user_id = await sync_to_async(authenticate_token)(raw_token) if raw_token else None
+    if user_id is None:
+        return await _send_json(
+            send, 401, {'error': 'Authentication credentials were not provided or are invalid'}, cors_headers,
+        )
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+            *cors_headers,
+        ],
+    })
+    subscription, backlog = broker.subscribe(user_id, asyncio.get_running_loop(), _last_event_id(scope))
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    heartbeat = settings.NOTE_EVENTS_HEARTBEAT
+    try:
+        chunks = [f'retry: {settings.NOTE_EVENTS_RETRY_MS}\n\n'.encode()]
+        chunks.extend([RESET_EVENT] if backlog is None else map(format_event, backlog))
+        await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': True})
+        while not disconnected.done():
+            events = await subscription.wait(heartbeat, disconnected)
+            if disconnected.done():
+                break
+            if subscription.overflowed:
+                subscription.overflowed = False
+                body = RESET_EVENT + b''.join(map(format_event, events))
+            elif events:
+                body = b''.join(map(format_event, events))
+            else:
+                body = HEARTBEAT
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
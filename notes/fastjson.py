@@ -0,0 +1,74 @@
+"""
+JSON encoding for API responses.
+
+Uses orjson when it is installed and otherwise a reusable, compact stdlib
+encoder.  Both produce UTF-8 bytes and encode datetimes themselves in the
+same ISO 8601 form as DRF ('Z' for UTC), so serializers can hand over
+datetime objects instead of formatting them first.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.utils.functional import Promise
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _isoformat(value):
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _default(obj):
+    """Types neither encoder handles natively"""
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _stdlib_default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.time)):
+        return _isoformat(obj)
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    return _default(obj)
+
+
+# One shared encoder instead of constructing a JSONEncoder per call
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_stdlib_default)
+
+
+def stdlib_dumps(data):
+    return _encoder.encode(data).encode()
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        """Serialize data to UTF-8 JSON bytes"""
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    dumps = stdlib_dumps
+    loads = json.loads
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.archive import archive_stale_notes
+
+
+class Command(BaseCommand):
+    help = 'Move notes not updated for a long time into the compressed archive (see notes/archive.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.NOTE_ARCHIVE_AFTER_DAYS,
+            help='Archive notes not updated for this many days',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.NOTE_ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            '--delay', type=float, default=settings.NOTE_ARCHIVE_BATCH_DELAY,
+            help='Seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        def progress(db, archived):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{db}: archived {archived} notes')
+
+        total = archive_stale_notes(options['days'], options['batch_size'], options['delay'], on_batch=progress)
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} notes.'))
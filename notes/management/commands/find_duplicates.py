@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.models import Note, NoteLSHBucket, NoteSignature
+from notes.similarity import duplicate_groups, index_notes
+
+
+class Command(BaseCommand):
+    help = 'List groups of near-duplicate notes per author (see notes/similarity.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', type=int, action='append', dest='authors',
+                            help='Only check these author ids')
+        parser.add_argument('--threshold', type=float, default=settings.NOTE_SIMILARITY_THRESHOLD,
+                            help='Minimum estimated similarity (0-1)')
+        parser.add_argument('--reindex', action='store_true',
+                            help='First index notes without an up-to-date signature and drop stale index rows')
+
+    def handle(self, *args, **options):
+        if options['reindex']:
+            for alias in settings.NOTE_SHARDS:
+                self.reindex(alias, options['authors'])
+
+        if options['authors']:
+            authors = options['authors']
+        else:
+            authors = sorted({
+                author_id
+                for alias in settings.NOTE_SHARDS
+                for author_id in NoteSignature.objects.using(alias).values_list('author_id', flat=True).distinct()
+            })
+        found = 0
+        for author_id in authors:
+            for group in duplicate_groups(author_id, options['threshold']):
+                titles = dict(Note.objects.filter(author_id=author_id, pk__in=group).values_list('pk', 'title'))
+                listed = ', '.join(f'{pk} "{titles.get(pk, "?")}"' for pk in group)
+                self.stdout.write(f'author {author_id}: {listed}')
+                found += 1
+        self.stdout.write(self.style.SUCCESS(f'{found} duplicate groups found.'))
+
+    def reindex(self, alias, authors):
+        notes = Note.objects.using(alias).only('pk', 'author_id', 'content').order_by('pk')
+        if authors:
+            notes = notes.filter(author_id__in=authors)
+        batch = []
+        for note in notes.iterator(chunk_size=1000):
+            batch.append(note)
+            if len(batch) == 1000:
+                index_notes(batch, using=alias)
+                batch = []
+        index_notes(batch, using=alias)
+        for model in (NoteLSHBucket, NoteSignature):
+            stale = model.objects.using(alias).exclude(note_id__in=Note.objects.using(alias).values('pk'))
+            deleted = stale._raw_delete(alias)
+            if deleted:
+                self.stdout.write(f'{alias}: removed {deleted} stale {model._meta.verbose_name} rows')
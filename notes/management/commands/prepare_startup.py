@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from notes.sharding import seed_shard_sequence
+from notes.startup import (
+    collected_static_is_current, static_hash_path, static_source_hash, unmigrated_databases,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Migrate the default and note shard databases and collect static files, '
+        'skipping each step when it has nothing to do'
+    )
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Run migrate and collectstatic even if they look up to date')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        aliases = dict.fromkeys(['default', *settings.NOTE_SHARDS]) if force else unmigrated_databases()
+        for alias in aliases:
+            self.stdout.write(f'Migrating {alias}')
+            call_command('migrate', database=alias, interactive=False, verbosity=0)
+            if alias in settings.NOTE_SHARDS:
+                seed_shard_sequence(alias)
+        if not aliases:
+            self.stdout.write('Migrations up to date')
+
+        source_hash = static_source_hash()
+        if force or not collected_static_is_current(source_hash):
+            self.stdout.write('Collecting static files')
+            call_command('collectstatic', interactive=False, verbosity=0)
+            static_hash_path().write_text(source_hash)
+        else:
+            self.stdout.write('Static files up to date')
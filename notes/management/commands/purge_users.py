@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.purge import pending_purges, run_purge, schedule_user_purge
+
+
+class Command(BaseCommand):
+    help = 'Delete the notes of disabled accounts in throttled batches, then the accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Disable these accounts and schedule them for purging first',
+        )
+        parser.add_argument('--batch-size', type=int, default=settings.NOTE_PURGE_BATCH_SIZE)
+        parser.add_argument(
+            '--delay', type=float, default=settings.NOTE_PURGE_BATCH_DELAY,
+            help='Seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        for username in options['usernames']:
+            try:
+                user = User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+            schedule_user_purge(user)
+            self.stdout.write(f'Disabled {username} and scheduled purge')
+
+        for purge in pending_purges():
+            self.stdout.write(f'Purging {purge.username}...')
+            purge = run_purge(purge, options['batch_size'], options['delay'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Purged {purge.username}: {purge.notes_deleted} notes deleted'
+            ))
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.models import AuthorShard
+from notes.sharding import default_shard_for_author, move_author, seed_shard_sequence
+
+
+class Command(BaseCommand):
+    help = (
+        'Create/migrate every note shard in NOTE_SHARDS, then move authors whose notes '
+        'are not on their target shard (run after changing NOTES_SHARD_COUNT)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', type=int, action='append', dest='authors',
+                            help='Only consider these author ids')
+        parser.add_argument('--to', dest='target', help='Move the given authors to this shard')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--grace', type=float, default=settings.NOTE_SHARD_MAP_TTL,
+                            help='Seconds to wait for cached shard lookups to expire before deleting old copies')
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--migrate-only', action='store_true',
+                            help='Only create/migrate the shard databases')
+
+    def handle(self, *args, **options):
+        target = options['target']
+        if target and target not in settings.NOTE_SHARDS:
+            raise CommandError(f'Unknown shard "{target}"; configured: {", ".join(settings.NOTE_SHARDS)}')
+        if target and not options['authors']:
+            raise CommandError('--to requires --author')
+
+        if not options['dry_run']:
+            for alias in settings.NOTE_SHARDS:
+                call_command('migrate', database=alias, interactive=False, verbosity=0)
+                seed_shard_sequence(alias)
+        if options['migrate_only']:
+            return
+
+        assignments = AuthorShard.objects.order_by('author_id')
+        if options['authors']:
+            assignments = assignments.filter(author_id__in=options['authors'])
+        moves = [
+            (a.author_id, a.shard, target or default_shard_for_author(a.author_id))
+            for a in assignments
+        ]
+        moves = [m for m in moves if m[1] != m[2]]
+        if not moves:
+            self.stdout.write('All authors are on their target shard.')
+            return
+        for author_id, source, destination in moves:
+            if options['dry_run']:
+                self.stdout.write(f'Would move author {author_id}: {source} -> {destination}')
+                continue
+            moved = move_author(author_id, destination, options['batch_size'], options['grace'])
+            self.stdout.write(f'Moved author {author_id}: {source} -> {destination} ({moved} notes)')
+        self.stdout.write(self.style.SUCCESS(f'{len(moves)} authors rebalanced.'))
@@ -0,0 +1,30 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from notes.tasks import run_workers
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (see notes/tasks.py); start as many as you like'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Worker threads in this process for each shard queue')
+        parser.add_argument('--batch', type=int, default=1,
+                            help='Tasks each thread claims at a time')
+        parser.add_argument('--poll-interval', type=float, default=None,
+                            help='Seconds to wait when no task is ready (default TASK_POLL_INTERVAL)')
+        parser.add_argument('--burst', action='store_true',
+                            help='Exit once no task is ready instead of waiting for more')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # Finish the task at hand, hand back the rest of the batch, then exit
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        ran = run_workers(
+            options['concurrency'], options['batch'], options['burst'], stop, options['poll_interval'],
+        )
+        self.stdout.write(f'Ran {ran} tasks.')
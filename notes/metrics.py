@@ -0,0 +1,153 @@
+"""
+Request metrics shared by every worker process, exposed at /metrics.
+
+Each series (a metric name plus its labels, e.g.
+'noteapp_http_requests_total{route="drf_note_detail",method="GET",status="200"}')
+is one record in a SharedSlotFile holding the series name and a float, so
+counts survive worker recycling and /metrics from any worker reports the
+whole host.  Histogram buckets are stored non-cumulatively, so an
+observation is one increment, and made cumulative when rendered.
+MetricsMiddleware applies all of a request's updates under a single lock.
+"""
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .sharedmem import SharedSlotFile, fingerprint
+
+METRICS = {
+    'noteapp_http_requests_total': ('counter', 'Requests by URL name, method and status'),
+    'noteapp_http_request_duration_seconds': ('histogram', 'Request latency by URL name'),
+    'noteapp_db_queries_total': ('counter', 'Database queries by URL name'),
+    'noteapp_cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'noteapp_auth_attempts_total': ('counter', 'Login, registration and token requests by result'),
+}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_LABELS = [f'{bound:g}' for bound in LATENCY_BUCKETS] + ['+Inf']
+METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+AUTH_ROUTES = frozenset({
+    'login', 'register', 'api_login', 'api_register', 'api_token_obtain_pair', 'api_token_refresh',
+    'drf_login', 'drf_register',
+})
+
+store = SharedSlotFile(lambda: settings.METRICS_STATE_FILE, f'{settings.METRICS_SERIES_LENGTH}sd',
+                       settings.METRICS_SLOTS)
+
+
+def series(name, **labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+def record(updates):
+    """Add each amount to its series; updates is an iterable of (series, amount)"""
+    with store.locked():
+        for key, amount in updates:
+            key_fingerprint = fingerprint(key)
+            index, (_, value) = store.find(key_fingerprint)
+            store.write(index, key_fingerprint, key.encode(), value + amount)
+
+
+def inc(name, amount=1, **labels):
+    record([(series(name, **labels), amount)])
+
+
+def latency_updates(name, seconds, **labels):
+    bucket = LATENCY_LABELS[bisect_left(LATENCY_BUCKETS, seconds)]
+    return [
+        (series(f'{name}_bucket', **labels, le=bucket), 1),
+        (series(f'{name}_sum', **labels), seconds),
+    ]
+
+
+def snapshot():
+    """{series: value} for every recorded series"""
+    with store.locked():
+        return {
+            name.rstrip(b'\0').decode(): value
+            for _, (name, value) in store.records()
+        }
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(values):
+    """Prometheus text exposition format"""
+    families = {}
+    for key, value in values.items():
+        name, _, labels = key.partition('{')
+        families.setdefault(name, []).append((labels.rstrip('}'), value))
+
+    lines = []
+    for metric, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        if kind != 'histogram':
+            for labels, value in sorted(families.get(metric, ())):
+                lines.append(f'{metric}{{{labels}}} {format_value(value)}' if labels
+                             else f'{metric} {format_value(value)}')
+            continue
+        # Regroup bucket series by their labels without le, then accumulate
+        buckets = {}
+        for labels, value in families.get(f'{metric}_bucket', ()):
+            base, _, bound = labels.rpartition('le="')
+            buckets.setdefault(base.rstrip(','), {})[bound.rstrip('"')] = value
+        sums = dict(families.get(f'{metric}_sum', ()))
+        for base in sorted(buckets):
+            prefix = f'{base},' if base else ''
+            total = 0
+            for bound in LATENCY_LABELS:
+                total += buckets[base].get(bound, 0)
+                lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {format_value(total)}')
+            lines.append(f'{metric}_sum{{{base}}} {format_value(sums.get(base, 0.0))}')
+            lines.append(f'{metric}_count{{{base}}} {format_value(total)}')
+    return '\n'.join(lines) + '\n'
+
+
+class QueryCounter:
+    """execute_wrapper that counts queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Count requests, latency and database queries per URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in settings.NOTE_SHARDS:
+                stack.enter_context(connections[alias].execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unmatched'
+        method = request.method if request.method in METHODS else 'other'
+        status = response.status_code
+        updates = [
+            (series('noteapp_http_requests_total', route=route, method=method, status=status), 1),
+            *latency_updates('noteapp_http_request_duration_seconds', elapsed, route=route),
+        ]
+        if queries.count:
+            updates.append((series('noteapp_db_queries_total', route=route), queries.count))
+        if route in AUTH_ROUTES and method == 'POST':
+            result = 'failure' if status >= 400 else 'success'
+            updates.append((series('noteapp_auth_attempts_total', route=route, result=result), 1))
+        record(updates)
+        return response
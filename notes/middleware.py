@@ -0,0 +1,178 @@
+import mimetypes
+import re
+import secrets
+import zlib
+from gzip import GzipFile
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.text import StreamingBuffer
+
+re_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class StaticAssetMiddleware:
+    """Serve collected static files from STATIC_ROOT.
+
+    Content-hashed names get a far-future immutable Cache-Control, other files
+    a short one.  Every response carries an ETag, and the precompressed .gz
+    copy is sent to clients that accept gzip.  start.sh runs uvicorn, which
+    leaves /static/ to this middleware; in development runserver serves
+    static files itself before this middleware is reached.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.root = str(settings.STATIC_ROOT)
+        self._hashed_names = None
+
+    @property
+    def hashed_names(self):
+        if self._hashed_names is None:
+            self._hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hashed_names
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD') or not request.path.startswith(self.prefix):
+            return self.get_response(request)
+        name = request.path[len(self.prefix):]
+        try:
+            path = Path(safe_join(self.root, name))
+        except SuspiciousFileOperation:
+            return self.get_response(request)
+        try:
+            stat = path.stat()
+        except OSError:
+            return self.get_response(request)
+        if not path.is_file():
+            return self.get_response(request)
+        return self.serve(request, name, path, stat)
+
+    def serve(self, request, name, path, stat):
+        if name in self.hashed_names:
+            cache_control = f'public, max-age={settings.STATIC_CACHE_MAX_AGE}, immutable'
+        else:
+            cache_control = 'public, max-age=60'
+
+        compressed = path.with_name(path.name + '.gz')
+        use_gzip = (
+            re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            and compressed.is_file()
+        )
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-gz" if use_gzip else ""}"'
+
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = HttpResponseNotModified()
+        else:
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            response = FileResponse(open(compressed if use_gzip else path, 'rb'), content_type=content_type)
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = cache_control
+        if compressed.is_file():
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+# Content types that are already compressed or must not be buffered
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip', 'text/event-stream')
+
+
+def padded_gzip_file(buffer, level, max_random_bytes):
+    """A GzipFile writing into buffer whose header carries a random-length file name.
+
+    The padding varies the compressed size from response to response, as
+    Django's GZipMiddleware does against BREACH-style length attacks.
+    """
+    filename = b'a' * secrets.randbelow(max_random_bytes) if max_random_bytes else None
+    return GzipFile(filename=filename, mode='wb', compresslevel=level, fileobj=buffer, mtime=0)
+
+
+def compress_bytes(data, level, max_random_bytes=None):
+    buffer = BytesIO()
+    with padded_gzip_file(buffer, level, max_random_bytes) as zfile:
+        zfile.write(data)
+    return buffer.getvalue()
+
+
+def compress_chunks(chunks, level, max_random_bytes=None):
+    buffer = StreamingBuffer()
+    with padded_gzip_file(buffer, level, max_random_bytes) as zfile:
+        yield buffer.read()
+        for chunk in chunks:
+            zfile.write(chunk)
+            # Sync-flush each chunk so a slow stream still reaches the client promptly
+            zfile.flush(zlib.Z_SYNC_FLUSH)
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+async def compress_async_chunks(chunks, level, max_random_bytes=None):
+    buffer = StreamingBuffer()
+    with padded_gzip_file(buffer, level, max_random_bytes) as zfile:
+        yield buffer.read()
+        async for chunk in chunks:
+            zfile.write(chunk)
+            zfile.flush(zlib.Z_SYNC_FLUSH)
+            data = buffer.read()
+            if data:
+                yield data
+    yield buffer.read()
+
+
+class ApiCompressionMiddleware(GZipMiddleware):
+    """Django's GZipMiddleware limited to API responses, at API_COMPRESSION_LEVEL.
+
+    Only applies under API_COMPRESSION_PREFIX.  Responses smaller than
+    API_COMPRESSION_MIN_SIZE, already encoded, or of an incompressible type
+    are left alone.  Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefix = settings.API_COMPRESSION_PREFIX
+        self.min_size = settings.API_COMPRESSION_MIN_SIZE
+        self.level = settings.API_COMPRESSION_LEVEL
+
+    def process_response(self, request, response):
+        if not request.path.startswith(self.prefix):
+            return response
+        if response.get('Content-Type', '').startswith(INCOMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not re_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            return response
+
+        if response.streaming:
+            compress = compress_async_chunks if response.is_async else compress_chunks
+            response.streaming_content = compress(response.streaming_content, self.level, self.max_random_bytes)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_bytes(response.content, self.level, self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is a different byte sequence, so a strong ETag no longer holds
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+from notes.search import install_note_fts, uninstall_note_fts
+
+
+def install_fts(apps, schema_editor):
+    install_note_fts(schema_editor)
+
+
+def uninstall_fts(apps, schema_editor):
+    uninstall_note_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_notepurge'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', '-updated_at'], name='notes_note_author_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['-updated_at'], name='notes_note_updated_idx'),
+        ),
+        migrations.RunPython(install_fts, uninstall_fts),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:52
+
+from django.db import migrations, models
+
+from notes.search import install_note_fts
+from notes.suggest import normalize_title
+
+
+def fill_title_normalized(apps, schema_editor):
+    Note = apps.get_model('notes', 'Note')
+    notes = Note.objects.using(schema_editor.connection.alias).only('id', 'title')
+    batch = []
+    for note in notes.iterator(chunk_size=2000):
+        note.title_normalized = normalize_title(note.title)
+        batch.append(note)
+        if len(batch) == 2000:
+            Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['title_normalized'])
+            batch = []
+    Note.objects.using(schema_editor.connection.alias).bulk_update(batch, ['title_normalized'])
+
+
+def reinstall_fts(apps, schema_editor):
+    # Adding the column rebuilt notes_note, which dropped the FTS triggers
+    install_note_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_author_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='title_normalized',
+            field=models.CharField(default='', editable=False, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'title_normalized'], name='notes_note_author_title_idx'),
+        ),
+        migrations.RunPython(fill_title_normalized, migrations.RunPython.noop),
+        migrations.RunPython(reinstall_fts, migrations.RunPython.noop),
+    ]
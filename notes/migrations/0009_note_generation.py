@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('notes', '0008_archived_note'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoteGeneration',
+            fields=[
+                ('author', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('generation', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def create_shard_task_table(apps, schema_editor):
+    # Shards that ran 0007 before tasks were queued per shard don't have the table
+    Task = apps.get_model('notes', 'Task')
+    connection = schema_editor.connection
+    if Task._meta.db_table not in connection.introspection.table_names():
+        schema_editor.create_model(Task)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0009_note_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_shard_task_table, migrations.RunPython.noop),
+    ]
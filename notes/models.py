@@ -1,16 +1,202 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
+from .sharding import author_id_from_lookups, is_sharded, shard_for_author
+from .suggest import normalize_title
+
+
+class AuthorShardedQuerySet(models.QuerySet):
+    """Sends queries and writes scoped to one author to that author's shard"""
+
+    def filter(self, *args, **kwargs):
+        queryset = super().filter(*args, **kwargs)
+        if queryset._db is None and is_sharded():
+            author_id = author_id_from_lookups(kwargs)
+            if author_id is not None:
+                queryset._db = shard_for_author(author_id)
+        return queryset
+
+    def create(self, **kwargs):
+        if self._db is None and is_sharded():
+            author_id = author_id_from_lookups(kwargs)
+            if author_id is not None:
+                return self.using(shard_for_author(author_id)).create(**kwargs)
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().bulk_create(objs, *args, **kwargs)
+        by_shard = {}
+        for obj in objs:
+            by_shard.setdefault(shard_for_author(obj.author_id), []).append(obj)
+        created = []
+        for alias, shard_objs in by_shard.items():
+            created.extend(self.using(alias).bulk_create(shard_objs, *args, **kwargs))
+        return created
+
+
+class NoteQuerySet(AuthorShardedQuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is None and is_sharded():
+            # Comes back here once per shard with the database set
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        for obj in objs:
+            obj.title_normalized = normalize_title(obj.title)
+        created = super().bulk_create(objs, *args, **kwargs)
+        # bulk_create sends no post_save, so queue duplicate-search indexing here
+        from .tasks import enqueue
+        by_author = {}
+        for note in created:
+            if note.pk is not None:
+                by_author.setdefault(note.author_id, []).append(note.pk)
+        for author_id, note_ids in by_author.items():
+            for start in range(0, len(note_ids), 500):
+                enqueue('notes.index_notes', author_id, note_ids[start:start + 500], using=self.db)
+        return created
 
 
 class Note(models.Model):
     title = models.CharField(max_length=200)
+    # Accent-stripped, case-folded title for prefix suggestions, see notes/suggest.py
+    title_normalized = models.CharField(max_length=200, default='', editable=False)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    author = models.ForeignKey(User, on_delete=models.CASCADE)
+    # No database-level constraint: with sharding the users table lives in another file
+    author = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
+
+    objects = NoteQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['author', '-updated_at'], name='notes_note_author_updated_idx'),
+            models.Index(fields=['-updated_at'], name='notes_note_updated_idx'),
+            models.Index(fields=['author', 'title_normalized'], name='notes_note_author_title_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def save(self, *args, **kwargs):
+        self.title_normalized = normalize_title(self.title)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'title' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'title_normalized'}
+        super().save(*args, **kwargs)
+
+
+class NoteGeneration(models.Model):
+    """Counter bumped by every write to an author's notes (see notes/cache.py)"""
+    author = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, db_constraint=False,
+                                  related_name='+')
+    generation = models.BigIntegerField()
+
+    objects = AuthorShardedQuerySet.as_manager()
+
+
+class NotePurge(models.Model):
+    """A disabled account whose notes are being deleted in batches"""
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, related_name='note_purge')
+    username = models.CharField(max_length=150)
+    notes_deleted = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return self.username
+
+
+class AuthorShard(models.Model):
+    """Which database holds an author's notes (see notes/sharding.py)"""
+    author = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='note_shard')
+    shard = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.author_id} -> {self.shard}'
+
+
+class NoteSignature(models.Model):
+    """MinHash signature of a note's content (see notes/similarity.py)"""
+    note = models.OneToOneField(Note, on_delete=models.CASCADE, primary_key=True, db_constraint=False,
+                                related_name='signature')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    signature = models.BinaryField()
+    content_hash = models.BigIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AuthorShardedQuerySet.as_manager()
+
+
+class NoteLSHBucket(models.Model):
+    """One LSH band of a note's signature; notes sharing a bucket are duplicate candidates"""
+    # note_id * BANDS + band, so ids stay unique across shards and moves
+    id = models.BigIntegerField(primary_key=True)
+    note = models.ForeignKey(Note, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    bucket = models.BigIntegerField()
+
+    objects = AuthorShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', 'bucket'], name='notes_lshbucket_author_idx'),
+        ]
+
+
+class ArchivedNote(models.Model):
+    """A note not updated for a long time, moved out of the notes table (see notes/archive.py)"""
+    # The note's own id, so links to it keep working
+    id = models.BigIntegerField(primary_key=True)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False, related_name='+')
+    title = models.CharField(max_length=200)
+    content = models.BinaryField()  # zlib-compressed UTF-8
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AuthorShardedQuerySet.as_manager()
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['author', '-updated_at'], name='notes_archived_author_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class Task(models.Model):
+    """A unit of background work for `manage.py run_worker` (see notes/tasks.py)"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    run_at = models.DateTimeField(default=timezone.now)
+    # Set while a worker holds the task; another worker may take it once this passes
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=200, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='notes_task_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,78 @@
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+
+def estimated_row_count(model, using):
+    """Cheap estimate of a table's row count.
+
+    Reads the row count ANALYZE stored in sqlite_stat1 when there is one and
+    falls back to the largest primary key, which SQLite finds in the index.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone():
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s AND idx IS NULL', [table]
+                )
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+        pk_column = connection.ops.quote_name(model._meta.pk.column)
+        cursor.execute(f'SELECT MAX({pk_column}) FROM {connection.ops.quote_name(table)}')
+        return cursor.fetchone()[0] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never runs an exact COUNT(*) over a large table.
+
+    Unfiltered querysets use estimated_row_count(); filtered ones are counted
+    exactly, but only up to count_limit rows.  Past that the paginator is
+    `capped`: count is only a lower bound (shown as "10000+"), any page number may be
+    asked for, and a page has a next page whenever it is full.
+    """
+    count_limit = 10000
+    capped = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return estimated_row_count(queryset.model, queryset.db)
+        counted = queryset.order_by().values('pk')[:self.count_limit + 1].count()
+        self.capped = counted > self.count_limit
+        return counted
+
+    def validate_number(self, number):
+        if not (self.count and self.capped):
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_('That page number is not an integer'))
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.capped:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        # One row past the page tells whether there is a next one
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        if bottom + len(rows) > self.count:
+            self.count = bottom + len(rows)
+            self.__dict__.pop('num_pages', None)
+            self.__dict__.pop('page_range', None)
+        return self._get_page(rows[:self.per_page], number, self)
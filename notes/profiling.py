@@ -0,0 +1,159 @@
+"""
+On-demand request profiling.
+
+A request is profiled when its path starts with one of NOTE_PROFILE_PATHS,
+its user is one of NOTE_PROFILE_USERS, or it is picked by
+NOTE_PROFILE_SAMPLE_RATE.  NOTE_PROFILE_MODE chooses between cProfile
+(a .prof file for pstats/snakeviz) and a wall-clock stack sampler (a
+.collapsed file for flamegraph.pl/speedscope).  Dumps go to NOTE_PROFILE_DIR,
+which keeps the newest NOTE_PROFILE_KEEP files.  With none of the three
+selectors set the middleware removes itself from the stack.
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PROFILE_SUFFIXES = ('.prof', '.collapsed')
+re_unsafe = re.compile(r'[^A-Za-z0-9]+')
+
+
+def profile_dir():
+    return Path(settings.NOTE_PROFILE_DIR)
+
+
+def list_profiles():
+    """Dump files, newest first"""
+    try:
+        entries = [e for e in os.scandir(profile_dir()) if e.is_file() and e.name.endswith(PROFILE_SUFFIXES)]
+    except FileNotFoundError:
+        return []
+    return sorted(entries, key=lambda e: e.stat().st_mtime_ns, reverse=True)
+
+
+def rotate_profiles(keep):
+    for entry in list_profiles()[keep:]:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def profile_name(request, elapsed, suffix):
+    slug = re_unsafe.sub('-', request.path).strip('-') or 'root'
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+    return f'{stamp}-{os.getpid()}-{request.method}-{slug[:80]}-{elapsed * 1000:.0f}ms{suffix}'
+
+
+class StackSampler:
+    """Samples one thread's stack every interval seconds into collapsed stacks"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = threading.get_ident()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'.replace(';', ':'))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ProfilingMiddleware:
+    """Profile selected requests and write the result to NOTE_PROFILE_DIR"""
+
+    def __init__(self, get_response):
+        self.paths = tuple(settings.NOTE_PROFILE_PATHS)
+        self.users = frozenset(settings.NOTE_PROFILE_USERS)
+        self.sample_rate = settings.NOTE_PROFILE_SAMPLE_RATE
+        if not (self.paths or self.users or self.sample_rate):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.mode = settings.NOTE_PROFILE_MODE
+        self.interval = settings.NOTE_PROFILE_INTERVAL
+        self.keep = settings.NOTE_PROFILE_KEEP
+
+    def selected(self, request):
+        if self.paths and request.path.startswith(self.paths):
+            return True
+        if self.users and request_username(request) in self.users:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.selected(request):
+            return self.get_response(request)
+        if self.mode == 'sample':
+            profiler = StackSampler(self.interval)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile at a time per process
+                return self.get_response(request)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.mode == 'sample':
+                profiler.stop()
+                suffix = '.collapsed'
+            else:
+                profiler.disable()
+                suffix = '.prof'
+            directory = profile_dir()
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / profile_name(request, elapsed, suffix)
+            if self.mode == 'sample':
+                profiler.dump(path)
+            else:
+                profiler.dump_stats(path)
+            rotate_profiles(self.keep)
+
+
+def request_username(request):
+    """Session user, or the user of a valid JWT bearer token"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.get_username()
+    if not request.META.get('HTTP_AUTHORIZATION'):
+        return None
+    from rest_framework.exceptions import APIException
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except APIException:
+        return None
+    return result[0].get_username() if result else None
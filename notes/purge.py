@@ -0,0 +1,94 @@
+"""
+Batched deletion of notes.
+
+Deleting a user (or a large queryset of notes) through the ORM makes Django's
+collector load every row and send per-object signals inside one transaction,
+holding the SQLite write lock for the whole operation.  The helpers here
+delete a fixed number of rows per short transaction instead, so other writers
+get the lock between batches and an interrupted run simply resumes.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import bump_note_generation
+from .models import ArchivedNote, Note, NoteLSHBucket, NotePurge, NoteSignature
+
+
+def delete_notes_in_batches(queryset, batch_size=None, delay=None, on_batch=None):
+    """Delete every note in queryset (of Note or ArchivedNote), batch_size rows per transaction.
+
+    on_batch(deleted) is called inside each batch's transaction so progress
+    bookkeeping commits together with the rows it describes.
+    Returns the number of notes deleted.
+    """
+    if batch_size is None:
+        batch_size = settings.NOTE_PURGE_BATCH_SIZE
+    if delay is None:
+        delay = settings.NOTE_PURGE_BATCH_DELAY
+    db = queryset.db
+    total = 0
+    while True:
+        rows = list(queryset.order_by('pk').values_list('pk', 'author_id')[:batch_size])
+        if not rows:
+            break
+        pks = [pk for pk, _ in rows]
+        with transaction.atomic(using=db):
+            # Skip the collector and its signals; the only dependent rows are
+            # the duplicate-detection index, deleted directly as well
+            if queryset.model is Note:
+                for model in (NoteLSHBucket, NoteSignature):
+                    model.objects.using(db).filter(note_id__in=pks)._raw_delete(db)
+            deleted = queryset.model.objects.using(db).filter(pk__in=pks)._raw_delete(db)
+            if on_batch:
+                on_batch(deleted)
+        # The raw delete sends no signals, so invalidate cached pages here
+        for author_id in {author_id for _, author_id in rows}:
+            bump_note_generation(author_id)
+        total += deleted
+        if len(pks) < batch_size:
+            break
+        if delay:
+            time.sleep(delay)
+    return total
+
+
+def schedule_user_purge(user):
+    """Disable the account right away and queue its notes for deletion"""
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        user.is_active = False
+        purge, _ = NotePurge.objects.get_or_create(user=user, defaults={'username': user.username})
+    return purge
+
+
+def run_purge(purge, batch_size=None, delay=None):
+    """Delete the purge's remaining notes, then the user account itself"""
+    if purge.completed_at:
+        return purge
+
+    def record(deleted):
+        NotePurge.objects.filter(pk=purge.pk).update(
+            notes_deleted=F('notes_deleted') + deleted, updated_at=timezone.now()
+        )
+
+    if purge.user_id:
+        for model in (Note, ArchivedNote):
+            delete_notes_in_batches(
+                model.objects.filter(author_id=purge.user_id), batch_size, delay, on_batch=record
+            )
+    with transaction.atomic():
+        if purge.user_id:
+            # Only cheap cascades are left now that the notes are gone
+            User.objects.filter(pk=purge.user_id).delete()
+        NotePurge.objects.filter(pk=purge.pk).update(completed_at=timezone.now())
+    purge.refresh_from_db()
+    return purge
+
+
+def pending_purges():
+    return NotePurge.objects.filter(completed_at__isnull=True)
@@ -0,0 +1,15 @@
+from rest_framework.renderers import BaseRenderer
+
+from .fastjson import dumps
+
+
+class FastJSONRenderer(BaseRenderer):
+    """JSON renderer backed by notes.fastjson (orjson when available)"""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data)
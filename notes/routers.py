@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .sharding import PER_SHARD_MODELS, SHARDED_MODELS, is_sharded, shard_for_author
+
+
+class NoteShardRouter:
+    """Route sharded note models to their author's database, everything else to 'default'"""
+
+    def _db_for_instance(self, model, hints):
+        if not is_sharded():
+            return None
+        if model._meta.app_label != 'notes' or model._meta.model_name not in SHARDED_MODELS:
+            # Without this, related lookups from a sharded note (note.author)
+            # would follow the note to its shard
+            return 'default'
+        instance = hints.get('instance')
+        if isinstance(instance, User):
+            return shard_for_author(instance.pk)
+        author_id = getattr(instance, 'author_id', None)
+        if author_id is not None:
+            return shard_for_author(author_id)
+        return 'default'
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_instance(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        models = {obj1._meta.model_name, obj2._meta.model_name}
+        if models & SHARDED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == 'default':
+            return None
+        if db not in settings.NOTE_SHARDS:
+            return None
+        # Shards carry the sharded notes tables, their own task queue, and
+        # the notes app's un-hinted RunPython/RunSQL steps (FTS triggers,
+        # data backfills)
+        return app_label == 'notes' and (
+            model_name is None or model_name in SHARDED_MODELS or model_name in PER_SHARD_MODELS
+        )
@@ -0,0 +1,77 @@
+"""
+SQLite FTS5 full-text index over note titles and content.
+
+The index is an external-content FTS5 table kept in sync by triggers, so it
+costs nothing to read paths that don't search.  Django rebuilds a table by
+copying it and dropping the original when a migration alters it on SQLite,
+which drops the triggers too; such migrations must call install_note_fts()
+again afterwards.
+"""
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'notes_note_fts'
+
+_INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, content, content='notes_note', content_rowid='id')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON notes_note BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+_UNINSTALL_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def fts_available(connection):
+    return connection.vendor == 'sqlite'
+
+
+def install_note_fts(schema_editor):
+    """Create (or re-create after a table rebuild) the index and its triggers"""
+    if not fts_available(schema_editor.connection):
+        return
+    for sql in _INSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def uninstall_note_fts(schema_editor):
+    if not fts_available(schema_editor.connection):
+        return
+    for sql in _UNINSTALL_SQL:
+        schema_editor.execute(sql)
+
+
+def optimize_note_fts(using):
+    """Merge the index and drop the entries of deleted notes, which FTS5 otherwise keeps around"""
+    connection = connections[using]
+    if not fts_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def fts_query(term):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    words = term.split()
+    return ' '.join('"%s"*' % word.replace('"', '""') for word in words)
+
+
+def matching_note_ids(term):
+    """Subquery of note ids whose title or content matches term"""
+    return RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [fts_query(term)])
@@ -0,0 +1,184 @@
+"""
+Author-sharded note storage.
+
+Notes live in one of several SQLite files (settings.NOTE_SHARDS, 'default'
+first) chosen per author, so writes from different users stop serializing on
+a single database's write lock.  Auth, sessions and the shard map itself
+stay on 'default'.
+
+An author's shard is recorded in AuthorShard the first time it is needed and
+only changes when `manage.py rebalance_note_shards` moves them, so adding a
+shard never silently strands existing notes.  Lookups are cached per process
+for NOTE_SHARD_MAP_TTL seconds.  With a single shard all of this is skipped.
+
+Each shard hands out note ids from its own range (see seed_shard_sequence)
+so ids stay unique across shards and survive moves between them.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+SHARD_ID_RANGE = 10 ** 12
+
+# Notes app models stored on the author's shard rather than on 'default'
+SHARDED_MODELS = {'note', 'notesignature', 'notelshbucket', 'archivednote', 'notegeneration'}
+
+# Notes app models with a table on every shard, always addressed with .using()
+PER_SHARD_MODELS = {'task'}
+
+_shard_cache = {}
+
+
+def is_sharded():
+    return len(settings.NOTE_SHARDS) > 1
+
+
+def default_shard_for_author(author_id):
+    return settings.NOTE_SHARDS[author_id % len(settings.NOTE_SHARDS)]
+
+
+def shard_for_author(author_id):
+    """Database alias holding the author's notes"""
+    if not is_sharded():
+        return settings.NOTE_SHARDS[0]
+    cached = _shard_cache.get(author_id)
+    now = time.monotonic()
+    if cached and cached[1] > now:
+        return cached[0]
+    from .models import AuthorShard, Note
+    alias = recorded_shard(author_id)
+    if alias is None:
+        # Notes written before sharding was turned on stay where they are
+        if Note.objects.using('default').filter(author_id=author_id).exists():
+            alias = 'default'
+        else:
+            alias = default_shard_for_author(author_id)
+        try:
+            with transaction.atomic():
+                AuthorShard.objects.create(author_id=author_id, shard=alias)
+        except IntegrityError:
+            alias = AuthorShard.objects.get(author_id=author_id).shard
+    _shard_cache[author_id] = (alias, now + settings.NOTE_SHARD_MAP_TTL)
+    return alias
+
+
+def recorded_shard(author_id):
+    """The author's shard from the shard map, without assigning one"""
+    from .models import AuthorShard
+    return AuthorShard.objects.filter(author_id=author_id).values_list('shard', flat=True).first()
+
+
+def forget_shard(author_id):
+    _shard_cache.pop(author_id, None)
+
+
+def author_id_from_lookups(kwargs):
+    """The author a filter() call is scoped to, if any"""
+    for key in ('author', 'author_id', 'author__id', 'author__pk'):
+        if key in kwargs:
+            value = kwargs[key]
+            return getattr(value, 'pk', value)
+    return None
+
+
+def seed_shard_sequence(alias):
+    """Start the shard's note ids at its own offset (a no-op once they are past it)"""
+    offset = settings.NOTE_SHARDS.index(alias) * SHARD_ID_RANGE
+    if not offset:
+        return
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'notes_note'")
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO sqlite_sequence (name, seq) VALUES ('notes_note', %s)", [offset]
+            )
+        elif row[0] < offset:
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = 'notes_note'", [offset])
+
+
+def copy_rows(model, queryset, target):
+    """Upsert the queryset's rows into target, keeping primary keys and timestamps.
+
+    Raw SQL because bulk_create() would re-stamp auto_now fields.
+    """
+    fields = model._meta.concrete_fields
+    connection = connections[target]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(f.column) for f in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    pk_column = quote(model._meta.pk.column)
+    updates = ', '.join(
+        f'{quote(f.column)} = excluded.{quote(f.column)}' for f in fields if not f.primary_key
+    )
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders}) '
+        f'ON CONFLICT ({pk_column}) DO UPDATE SET {updates}'
+    )
+    rows = [
+        [f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields]
+        for obj in queryset
+    ]
+    if rows:
+        with transaction.atomic(using=target), connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+    return len(rows)
+
+
+def sharded_models():
+    return [apps.get_model('notes', name) for name in sorted(SHARDED_MODELS)]
+
+
+def move_author(author_id, target, batch_size=500, grace=None):
+    """Move an author's rows to the target shard; return the number of notes moved.
+
+    Rows are copied, the shard map is switched, and after a grace period long
+    enough for every process's cached lookup to expire, rows written to the
+    old shard in the meantime are copied again before the old copies are
+    deleted.  Deletions made during that window are not carried over, so
+    run rebalances when traffic is quiet.
+    """
+    from .cache import bump_note_generation
+    from .models import AuthorShard, Note
+
+    source = shard_for_author(author_id)
+    if source == target:
+        return 0
+    if grace is None:
+        grace = settings.NOTE_SHARD_MAP_TTL
+    started = timezone.now()
+    moved = 0
+    for model in sharded_models():
+        queryset = model.objects.using(source).filter(author_id=author_id).order_by('pk')
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            copied = copy_rows(model, batch, target)
+            if model is Note:
+                moved += copied
+            last_pk = batch[-1].pk
+
+    AuthorShard.objects.update_or_create(author_id=author_id, defaults={'shard': target})
+    forget_shard(author_id)
+    if grace:
+        time.sleep(grace)
+
+    for model in sharded_models():
+        queryset = model.objects.using(source).filter(author_id=author_id)
+        # Archived notes keep the note's updated_at, so look at when they were archived
+        changed = next((name for name in ('archived_at', 'updated_at') if hasattr(model, name)), None)
+        if changed:
+            copy_rows(model, queryset.filter(**{f'{changed}__gte': started}), target)
+        while True:
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic(using=source):
+                model.objects.using(source).filter(pk__in=pks)._raw_delete(source)
+    bump_note_generation(author_id)
+    return moved
@@ -0,0 +1,138 @@
+"""
+Fixed-size record table in a memory-mapped file, shared by every worker
+process on the host.
+
+Records are addressed by a 64-bit fingerprint of a string key and found by
+linear probing from fingerprint % slots.  All access happens under an
+exclusive flock on the file, which is a couple of syscalls per operation.
+Each process maps the file itself (also after a fork) so the lock really
+excludes the other workers.  Where fcntl is unavailable the table falls back
+to a per-process lock and is then only shared between threads.
+"""
+import mmap
+import os
+import struct
+import threading
+from functools import lru_cache
+from hashlib import blake2b
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+PROBE_LIMIT = 16
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(key):
+    """Non-zero 64-bit hash of key; zero marks an empty slot"""
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), 'little') | 1
+
+
+class SharedSlotFile:
+    def __init__(self, get_path, value_format, slots):
+        """get_path is called on each access so settings overrides take effect"""
+        self.get_path = get_path
+        self.record = struct.Struct('<Q' + value_format)
+        self.empty_values = self.record.unpack(bytes(self.record.size))[1:]
+        self.slots = slots
+        self.size = self.record.size * slots
+        self._thread_lock = threading.Lock()
+        self._owner = None
+        self._file = None
+        self._map = None
+
+    def _open(self):
+        path = str(self.get_path())
+        owner = (os.getpid(), path)
+        if self._owner == owner:
+            return
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size != self.size:
+            self._lock_file()
+            try:
+                if os.fstat(self._file.fileno()).st_size != self.size:
+                    self._file.truncate(0)
+                    self._file.truncate(self.size)
+            finally:
+                self._unlock_file()
+        self._map = mmap.mmap(self._file.fileno(), self.size)
+        self._owner = owner
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def locked(self):
+        """Context manager holding the table's locks: `with table.locked():`"""
+        return self
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._open()
+            self._lock_file()
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self._unlock_file()
+        finally:
+            self._thread_lock.release()
+
+    def find(self, key_fingerprint, create=True, evict=None):
+        """(slot index, values) for the fingerprint, or None if absent and not create.
+
+        A slot to claim comes back with empty values and is only taken once
+        the caller writes it, so a lookup and its update are one read and one
+        write.  When every probed slot is taken, the one with the smallest
+        evict(values) is reused (the first probed if evict is None).
+        Call only while locked().
+        """
+        start = key_fingerprint % self.slots
+        empty = None
+        victim, victim_rank = None, None
+        for i in range(PROBE_LIMIT):
+            index = (start + i) % self.slots
+            record = self.record.unpack_from(self._map, index * self.record.size)
+            if record[0] == key_fingerprint:
+                return index, record[1:]
+            if record[0] == 0:
+                if empty is None:
+                    empty = index
+                break
+            rank = evict(record[1:]) if evict else i
+            if victim is None or rank < victim_rank:
+                victim, victim_rank = index, rank
+        if not create:
+            return None
+        return (empty if empty is not None else victim), self.empty_values
+
+    def read(self, index):
+        return self.record.unpack_from(self._map, index * self.record.size)[1:]
+
+    def write(self, index, key_fingerprint, *values):
+        self.record.pack_into(self._map, index * self.record.size, key_fingerprint, *values)
+
+    def records(self):
+        """(fingerprint, values) of every used slot; call only while locked()"""
+        for index in range(self.slots):
+            record = self.record.unpack_from(self._map, index * self.record.size)
+            if record[0]:
+                yield record[0], record[1:]
+
+    def reset(self):
+        with self.locked():
+            self._map[:] = bytes(self.size)
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cache import bump_note_generation
+from .events import broker
+from .models import ArchivedNote, Note, NoteGeneration
+from .purge import delete_notes_in_batches
+from .sharding import forget_shard, is_sharded, recorded_shard, seed_shard_sequence
+from .tasks import enqueue
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def note_changed(sender, instance, **kwargs):
+    bump_note_generation(instance.author_id)
+
+
+@receiver(post_save, sender=Note)
+def index_note_for_duplicates(sender, instance, using, update_fields, **kwargs):
+    # Signatures only depend on the content
+    if update_fields is None or 'content' in update_fields:
+        enqueue('notes.index_notes', instance.author_id, [instance.pk], using=using)
+
+
+@receiver(post_save, sender=Note)
+def publish_note_saved(sender, instance, created, **kwargs):
+    data = {'id': instance.pk, 'title': instance.title, 'updated_at': instance.updated_at}
+    event_type = 'note.created' if created else 'note.updated'
+    transaction.on_commit(lambda: broker.publish(instance.author_id, event_type, data))
+
+
+@receiver(post_delete, sender=Note)
+def publish_note_deleted(sender, instance, **kwargs):
+    data = {'id': instance.pk}
+    transaction.on_commit(lambda: broker.publish(instance.author_id, 'note.deleted', data))
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_notes(sender, instance, using, **kwargs):
+    # The deletion collector only looks for notes in the user's own database
+    if is_sharded():
+        shard = recorded_shard(instance.pk)
+        if shard and shard != using:
+            for model in (Note, ArchivedNote):
+                delete_notes_in_batches(model.objects.using(shard).filter(author_id=instance.pk), delay=0)
+            NoteGeneration.objects.using(shard).filter(author_id=instance.pk).delete()
+        forget_shard(instance.pk)
+
+
+def seed_shard_sequences(sender, using, **kwargs):
+    if using in settings.NOTE_SHARDS:
+        seed_shard_sequence(using)
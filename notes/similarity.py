@@ -0,0 +1,228 @@
+"""
+Near-duplicate notes via MinHash and locality-sensitive hashing.
+
+A note's content is split into word 3-grams ("shingles") and summarised by a
+MinHash signature of PERMUTATIONS 32-bit values; the share of equal values
+between two signatures estimates the Jaccard similarity of their shingle
+sets.  The signature is cut into BANDS bands of ROWS values and each band is
+hashed into a NoteLSHBucket row.  Notes that share any bucket are candidates,
+which are then checked against NOTE_SIMILARITY_THRESHOLD using their
+signatures.  With 16 bands of 4 rows a pair at 0.8 similarity shares a
+bucket with probability 0.9998 and a pair at 0.3 with 0.12, so a lookup
+reads only a note's few look-alikes, never every note of the author.
+
+Signatures are computed with NumPy when it is installed and with plain
+Python otherwise; both give identical values.  Signatures and buckets are
+refreshed on save (see notes/signals.py) and skipped when the content hash
+is unchanged.
+"""
+import random
+import re
+import struct
+import zlib
+from hashlib import blake2b
+
+from django.conf import settings
+from django.db import transaction
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PERMUTATIONS = 64
+BANDS = 16
+ROWS = PERMUTATIONS // BANDS
+SHINGLE_WORDS = 3
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+re_word = re.compile(r'\w+')
+
+# (a * x + b) % MERSENNE_PRIME with a, b < 2**31 and x < 2**32 never overflows 64 bits
+_rng = random.Random(0x5EED)
+_A = [_rng.randrange(1, 1 << 31) for _ in range(PERMUTATIONS)]
+_B = [_rng.randrange(0, 1 << 31) for _ in range(PERMUTATIONS)]
+_SIGNATURE = struct.Struct(f'<{PERMUTATIONS}I')
+if numpy is not None:
+    _A_COLUMN = numpy.array(_A, dtype=numpy.uint64)[:, None]
+    _B_COLUMN = numpy.array(_B, dtype=numpy.uint64)[:, None]
+
+
+def shingles(content):
+    """32-bit hashes of the content's word 3-grams (the whole text if shorter)"""
+    words = re_word.findall(content.casefold())
+    if len(words) <= SHINGLE_WORDS:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = [' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    return {zlib.crc32(gram.encode()) for gram in grams}
+
+
+def minhash(hashes):
+    """Signature tuple for a non-empty set of shingle hashes"""
+    if numpy is not None:
+        values = numpy.fromiter(hashes, dtype=numpy.uint64, count=len(hashes))
+        signature = numpy.full(PERMUTATIONS, MAX_HASH, dtype=numpy.uint64)
+        # Chunked so a huge note doesn't allocate PERMUTATIONS x len(hashes) at once
+        for start in range(0, len(values), 4096):
+            chunk = values[None, start:start + 4096]
+            permuted = (_A_COLUMN * chunk + _B_COLUMN) % MERSENNE_PRIME & MAX_HASH
+            signature = numpy.minimum(signature, permuted.min(axis=1))
+        return tuple(signature.tolist())
+    return tuple(
+        min(((a * x + b) % MERSENNE_PRIME) & MAX_HASH for x in hashes)
+        for a, b in zip(_A, _B)
+    )
+
+
+def content_hash(content):
+    return int.from_bytes(blake2b(content.encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+def band_buckets(signature):
+    """One signed 64-bit bucket key per band; the band number is part of the key"""
+    packed = _SIGNATURE.pack(*signature)
+    width = ROWS * 4
+    return [
+        int.from_bytes(
+            blake2b(packed[band * width:(band + 1) * width], digest_size=8,
+                    person=band.to_bytes(2, 'little')).digest(),
+            'little', signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def estimated_similarity(a, b):
+    return sum(x == y for x, y in zip(a, b)) / PERMUTATIONS
+
+
+def decode(signature):
+    return _SIGNATURE.unpack(bytes(signature))
+
+
+def index_notes(notes, using=None):
+    """Store signatures and LSH buckets for the notes, skipping unchanged content"""
+    from .models import NoteLSHBucket, NoteSignature
+
+    for note in notes:
+        db = using or NoteSignature.objects.filter(author_id=note.author_id).db
+        digest = content_hash(note.content)
+        existing = NoteSignature.objects.using(db).filter(note_id=note.pk).values_list('content_hash', flat=True)
+        if digest in existing:
+            continue
+        hashes = shingles(note.content)
+        with transaction.atomic(using=db):
+            NoteLSHBucket.objects.using(db).filter(note_id=note.pk).delete()
+            if not hashes:
+                NoteSignature.objects.using(db).filter(note_id=note.pk).delete()
+                continue
+            signature = minhash(hashes)
+            NoteSignature.objects.using(db).update_or_create(
+                note_id=note.pk,
+                defaults={
+                    'author_id': note.author_id,
+                    'signature': _SIGNATURE.pack(*signature),
+                    'content_hash': digest,
+                },
+            )
+            NoteLSHBucket.objects.using(db).bulk_create(
+                NoteLSHBucket(id=note.pk * BANDS + band, note_id=note.pk, author_id=note.author_id, bucket=bucket)
+                for band, bucket in enumerate(band_buckets(signature))
+            )
+
+
+def similar_notes(note, threshold=None, limit=20):
+    """[(similarity, note_id)] of the author's other notes at or above threshold, most similar first"""
+    from .models import NoteLSHBucket, NoteSignature
+
+    if threshold is None:
+        threshold = settings.NOTE_SIMILARITY_THRESHOLD
+    stored = NoteSignature.objects.filter(author_id=note.author_id, note_id=note.pk)
+    stored = stored.values_list('signature', flat=True).first()
+    if stored is not None:
+        signature = decode(stored)
+    else:
+        hashes = shingles(note.content)
+        if not hashes:
+            return []
+        signature = minhash(hashes)
+    candidates = (
+        NoteLSHBucket.objects.filter(author_id=note.author_id, bucket__in=band_buckets(signature))
+        .exclude(note_id=note.pk).values_list('note_id', flat=True).distinct()
+    )
+    rows = NoteSignature.objects.filter(author_id=note.author_id, note_id__in=list(candidates))
+    matches = []
+    for note_id, other in rows.values_list('note_id', 'signature'):
+        similarity = estimated_similarity(signature, decode(other))
+        if similarity >= threshold:
+            matches.append((similarity, note_id))
+    matches.sort(key=lambda match: (-match[0], match[1]))
+    return matches[:limit]
+
+
+def duplicate_groups(author_id, threshold=None):
+    """Groups (sorted lists of note ids) of the author's notes that are near-duplicates of each other.
+
+    Exact copies are grouped by content hash first, so only one note per
+    distinct content takes part in the bucket comparisons.  Within a bucket
+    each member is compared with the bucket's first member rather than with
+    every other member, which keeps imports of many identical notes linear.
+    """
+    from django.db.models import Count
+
+    from .models import NoteLSHBucket, NoteSignature
+
+    if threshold is None:
+        threshold = settings.NOTE_SIMILARITY_THRESHOLD
+    buckets = NoteLSHBucket.objects.filter(author_id=author_id)
+    shared = buckets.values('bucket').annotate(notes=Count('id')).filter(notes__gt=1).values('bucket')
+    members = {}
+    for bucket, note_id in buckets.filter(bucket__in=shared).values_list('bucket', 'note_id'):
+        members.setdefault(bucket, []).append(note_id)
+
+    # Union-find with union by size and path halving
+    parent = {}
+    size = {}
+
+    def root(note_id):
+        parent.setdefault(note_id, note_id)
+        while parent[note_id] != note_id:
+            parent[note_id] = parent[parent[note_id]]
+            note_id = parent[note_id]
+        return note_id
+
+    def union(a, b):
+        a, b = root(a), root(b)
+        if a != b:
+            if size.get(a, 1) < size.get(b, 1):
+                a, b = b, a
+            parent[b] = a
+            size[a] = size.get(a, 1) + size.get(b, 1)
+
+    involved = {note_id for note_ids in members.values() for note_id in note_ids}
+    signatures = {}
+    first_with_hash = {}
+    rows = NoteSignature.objects.filter(author_id=author_id, note_id__in=involved)
+    for note_id, digest, signature in rows.values_list('note_id', 'content_hash', 'signature'):
+        first = first_with_hash.setdefault(digest, note_id)
+        if first == note_id:
+            signatures[note_id] = decode(signature)
+        else:
+            union(first, note_id)
+
+    for note_ids in members.values():
+        # Exact copies are already joined; compare one note per content
+        distinct = [note_id for note_id in dict.fromkeys(note_ids) if note_id in signatures]
+        if len(distinct) < 2:
+            continue
+        first = distinct[0]
+        for note_id in distinct[1:]:
+            if root(note_id) != root(first) and \
+                    estimated_similarity(signatures[first], signatures[note_id]) >= threshold:
+                union(first, note_id)
+
+    groups = {}
+    for note_id in parent:
+        groups.setdefault(root(note_id), []).append(note_id)
+    return sorted(sorted(group) for group in groups.values() if len(group) > 1)
@@ -0,0 +1,94 @@
+"""
+Cheap checks that let container boot skip migrate and collectstatic.
+
+Both commands are slow even when there is nothing to do: migrate imports
+every migration module and emits post_migrate (contenttypes, permissions)
+and collectstatic re-hashes and re-compresses every file.  Here migrations
+are compared by name (directory listing against django_migrations) and
+static files by a hash of their sources, stored next to the manifest.
+Anything unexpected counts as "changed", so the real command runs.
+"""
+import hashlib
+import importlib.util
+import pkgutil
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+STATIC_HASH_FILE = '.source-hash'
+
+
+def disk_migrations():
+    """(app_label, name) of every migration file, without importing them"""
+    from django.db.migrations.loader import MigrationLoader
+
+    found = set()
+    for app_config in apps.get_app_configs():
+        module_name, _ = MigrationLoader.migrations_module(app_config.label)
+        if module_name is None:
+            continue
+        try:
+            spec = importlib.util.find_spec(module_name)
+        except ImportError:
+            continue
+        if spec is None or not spec.submodule_search_locations:
+            continue
+        for module in pkgutil.iter_modules(spec.submodule_search_locations):
+            if not module.ispkg and module.name[0] not in '_~':
+                found.add((app_config.label, module.name))
+    return found
+
+
+def applied_migrations(alias):
+    connection = connections[alias]
+    try:
+        if 'django_migrations' not in connection.introspection.table_names():
+            return set()
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT app, name FROM django_migrations')
+            return set(cursor.fetchall())
+    except DatabaseError:
+        return set()
+
+
+def unmigrated_databases():
+    """Aliases (default and the note shards) with migration files not yet applied"""
+    on_disk = disk_migrations()
+    aliases = dict.fromkeys(['default', *settings.NOTE_SHARDS])
+    return [alias for alias in aliases if not on_disk <= applied_migrations(alias)]
+
+
+def static_source_hash():
+    """Hash of the path and content of every file collectstatic would copy"""
+    from django.contrib.staticfiles.finders import get_finders
+
+    digest = hashlib.blake2b(digest_size=16)
+    seen = set()
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            prefixed = str(Path(getattr(storage, 'prefix', None) or '', path))
+            if prefixed in seen:
+                continue
+            seen.add(prefixed)
+            with storage.open(path) as f:
+                entries = [prefixed.encode(), hashlib.blake2b(f.read(), digest_size=16).digest()]
+            digest.update(b'\0'.join(entries) + b'\n')
+    return digest.hexdigest()
+
+
+def static_hash_path():
+    return Path(settings.STATIC_ROOT) / STATIC_HASH_FILE
+
+
+def collected_static_is_current(source_hash):
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    manifest = getattr(staticfiles_storage, 'manifest_name', None)
+    if manifest and not (Path(settings.STATIC_ROOT) / manifest).is_file():
+        return False
+    try:
+        return static_hash_path().read_text().strip() == source_hash
+    except OSError:
+        return False
@@ -0,0 +1,46 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Content-hashed static files, each with a precompressed .gz copy.
+
+    A hashed name only changes when the file's content does, so a .gz that
+    already exists for it is up to date and collectstatic skips it.
+    """
+    compress_extensions = ('.css', '.js', '.map', '.svg', '.txt', '.html', '.json', '.xml')
+    compress_min_size = 256
+
+    def stored_name(self, name):
+        # Before the first collectstatic there is no manifest; serve plain names
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for hashed_name in set(self.hashed_files.values()):
+            if hashed_name.endswith(self.compress_extensions):
+                self.compress(hashed_name)
+
+    def compress(self, name):
+        path = self.path(name)
+        compressed_path = path + '.gz'
+        if os.path.exists(compressed_path):
+            return False
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.compress_min_size:
+            return False
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) >= len(data):
+            return False
+        tmp_path = compressed_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, compressed_path)
+        return True
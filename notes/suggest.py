@@ -0,0 +1,110 @@
+"""
+As-you-type note title suggestions.
+
+Titles are stored a second time normalized (accents stripped, case-folded)
+in Note.title_normalized, indexed together with the author.  A prefix is a
+range on that index, title_normalized >= prefix and < the next string
+after every string starting with prefix, so SQLite seeks straight to the
+first match instead of scanning like LIKE '%...%' does.
+
+Users who type a lot get an in-process sorted copy of their normalized
+titles (NOTE_SUGGEST_CACHE_USERS of them, least recently used dropped),
+searched with bisect.  It is keyed on the user's note generation, which the
+Note signals bump, so any write makes it stale.
+"""
+import sys
+import unicodedata
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+from .cache import note_generation
+
+MAX_LENGTH = 200
+
+
+def normalize_title(title):
+    decomposed = unicodedata.normalize('NFKD', title)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return stripped.casefold()[:MAX_LENGTH]
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every string that starts with prefix, None if there is none"""
+    while prefix:
+        code = ord(prefix[-1]) + 1
+        if code == 0xD800:
+            # Surrogates can't be encoded; U+E000 is the next storable code point
+            code = 0xE000
+        if code <= sys.maxunicode:
+            return prefix[:-1] + chr(code)
+        # Past the last code point: carry into the previous character
+        prefix = prefix[:-1]
+    return None
+
+
+def query_suggestions(author_id, prefix, limit):
+    from .models import Note
+
+    queryset = Note.objects.filter(author_id=author_id)
+    if prefix:
+        queryset = queryset.filter(title_normalized__gte=prefix)
+        upper = prefix_upper_bound(prefix)
+        if upper is not None:
+            queryset = queryset.filter(title_normalized__lt=upper)
+    return list(queryset.order_by('title_normalized', 'id').values_list('id', 'title')[:limit])
+
+
+class TitleIndexCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def titles(self, author_id):
+        """Sorted (title_normalized, id, title) of the author's notes"""
+        from .models import Note
+
+        generation = note_generation(author_id)
+        with self._lock:
+            entry = self._entries.get(author_id)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(author_id)
+                return entry[1]
+        rows = list(
+            Note.objects.filter(author_id=author_id)
+            .order_by('title_normalized', 'id')
+            .values_list('title_normalized', 'id', 'title')
+        )
+        with self._lock:
+            self._entries[author_id] = (generation, rows)
+            self._entries.move_to_end(author_id)
+            while len(self._entries) > settings.NOTE_SUGGEST_CACHE_USERS:
+                self._entries.popitem(last=False)
+        return rows
+
+    def suggestions(self, author_id, prefix, limit):
+        rows = self.titles(author_id)
+        start = bisect_left(rows, (prefix,))
+        matches = []
+        for normalized, note_id, title in rows[start:start + limit]:
+            if not normalized.startswith(prefix):
+                break
+            matches.append((note_id, title))
+        return matches
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+title_cache = TitleIndexCache()
+
+
+def suggest_titles(author_id, prefix, limit=10):
+    """[(id, title)] of the author's notes whose title starts with prefix, ignoring case and accents"""
+    prefix = normalize_title(prefix)
+    if settings.NOTE_SUGGEST_CACHE_USERS:
+        return title_cache.suggestions(author_id, prefix, limit)
+    return query_suggestions(author_id, prefix, limit)
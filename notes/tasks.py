@@ -0,0 +1,255 @@
+"""
+Durable background tasks kept in the notes_task table.
+
+enqueue() inserts a row naming a registered task and its JSON arguments, and
+`manage.py run_worker` runs them.  A worker claims ready tasks with a single
+UPDATE that marks up to `batch` of them running under a token unique to the
+claim, so any number of worker threads and processes can poll the table
+without ever taking the same task.  A claim hides the task from other
+workers for TASK_VISIBILITY_TIMEOUT seconds, which the worker's heartbeat
+keeps extending while it runs; if the worker dies the claim runs out and
+another worker picks the task up.  A task that raises is retried with
+exponential backoff until max_attempts, then kept as failed with its
+traceback (see the admin).  Finished tasks are deleted.
+
+Every notes shard (settings.NOTE_SHARDS) has its own task table.  A caller
+passes the database it is writing to as `using` and the row goes into that
+database's queue in the caller's transaction, so a task only becomes
+visible once the write behind it commits, and writes to different shards
+never queue behind one database's write lock.  run_workers() runs
+workers for every shard's queue.  With TASK_QUEUE_EAGER tasks run inline
+instead.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Note, NotePurge, Task
+from .purge import run_purge
+from .similarity import index_notes
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name, max_attempts=None):
+    """Register the decorated function as the task called name"""
+    def register(func):
+        registry[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, *args, delay=0, using=None):
+    """Queue task name to be called with args (JSON values) in delay seconds.
+
+    using is the database of the caller's transaction, whose queue the task
+    goes into; by default the task table's usual database.
+    """
+    func, max_attempts = registry[name]
+    if settings.TASK_QUEUE_EAGER:
+        func(*args)
+        return None
+    task = Task(
+        name=name, args=list(args), max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    task.save(using=using or router.db_for_write(Task))
+    return task
+
+
+def ready_tasks(now, using='default'):
+    """Queued tasks that are due, and running ones whose worker's claim ran out"""
+    return Task.objects.using(using).filter(
+        Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+    )
+
+
+def retry_delay(attempts):
+    """Seconds before retrying a task that failed attempts times: doubling, capped, jittered"""
+    delay = min(settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1), settings.TASK_RETRY_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1)
+
+
+class Worker:
+    """Claims and runs tasks from one database's queue; one per thread"""
+
+    def __init__(self, name=None, batch=1, using='default'):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.batch = batch
+        self.using = using
+        self.ran = 0
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def tasks(self):
+        return Task.objects.using(self.using)
+
+    def claim(self):
+        """Take up to batch ready tasks, oldest first"""
+        now = timezone.now()
+        token = f'{self.name}:{uuid4().hex[:12]}'
+        oldest = ready_tasks(now, self.using).order_by('run_at', 'id').values('pk')[:self.batch]
+        # One statement: SQLite runs it under the write lock, so two workers
+        # can't both see a task as ready and take it
+        claimed = ready_tasks(now, self.using).filter(pk__in=oldest).update(
+            status=Task.RUNNING, locked_by=token, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASK_VISIBILITY_TIMEOUT),
+        )
+        if not claimed:
+            return []
+        return list(self.tasks().filter(locked_by=token, status=Task.RUNNING))
+
+    def execute(self, task):
+        """Run a claimed task; True if it succeeded and is left for finish() to delete"""
+        held = self.tasks().filter(pk=task.pk, locked_by=task.locked_by, status=Task.RUNNING)
+        if task.attempts > task.max_attempts:
+            # Claimed again after the worker on its last attempt stopped responding
+            held.update(status=Task.FAILED, locked_until=None, last_error='Worker timed out on the last attempt')
+            return False
+        try:
+            func, _ = registry[task.name]
+            func(*task.args)
+        except Exception:
+            logger.exception('Task %s failed (attempt %d of %d)', task, task.attempts, task.max_attempts)
+            error = traceback.format_exc()
+            if task.attempts >= task.max_attempts:
+                held.update(status=Task.FAILED, locked_until=None, last_error=error)
+            else:
+                held.update(
+                    status=Task.QUEUED, locked_until=None, last_error=error,
+                    run_at=timezone.now() + timedelta(seconds=retry_delay(task.attempts)),
+                )
+            return False
+        finally:
+            self.ran += 1
+        return True
+
+    def finish(self, tasks):
+        """Delete tasks that ran successfully, in one statement per batch"""
+        if tasks:
+            # Filtered on the claim: if it ran out and another worker has a
+            # task now, that worker finishes it
+            self.tasks().filter(
+                pk__in=[task.pk for task in tasks], locked_by=tasks[0].locked_by, status=Task.RUNNING,
+            ).delete()
+
+    def release(self, tasks):
+        """Hand back claimed tasks that weren't started"""
+        for task in tasks:
+            self.tasks().filter(pk=task.pk, locked_by=task.locked_by, status=Task.RUNNING).update(
+                status=Task.QUEUED, locked_until=None, attempts=F('attempts') - 1,
+            )
+
+    def run_once(self, stop=None):
+        """Claim and run one batch; returns the number of tasks claimed"""
+        tasks = self.claim()
+        if not tasks:
+            return 0
+        token = tasks[0].locked_by
+        with self._lock:
+            self._held.add(token)
+        done = []
+        try:
+            for i, task in enumerate(tasks):
+                if stop is not None and stop.is_set():
+                    self.release(tasks[i:])
+                    break
+                if self.execute(task):
+                    done.append(task)
+        finally:
+            self.finish(done)
+            with self._lock:
+                self._held.discard(token)
+        return len(tasks)
+
+    def heartbeat(self):
+        """Push back the claim timeout of the tasks this worker holds"""
+        with self._lock:
+            tokens = list(self._held)
+        if tokens:
+            self.tasks().filter(locked_by__in=tokens, status=Task.RUNNING).update(
+                locked_until=timezone.now() + timedelta(seconds=settings.TASK_VISIBILITY_TIMEOUT),
+            )
+
+    def run(self, stop=None, burst=False, poll_interval=None):
+        """Run tasks until stop is set, or with burst until none is ready"""
+        stop = stop or threading.Event()
+        if poll_interval is None:
+            poll_interval = settings.TASK_POLL_INTERVAL
+        while not stop.is_set():
+            try:
+                claimed = self.run_once(stop)
+            except DatabaseError:
+                logger.exception('Task worker %s could not reach the queue', self.name)
+                claimed = 0
+            if not claimed:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+        return self.ran
+
+
+def run_workers(concurrency=1, batch=1, burst=False, stop=None, poll_interval=None):
+    """Run concurrency worker threads per shard queue until stop is set; returns the number of tasks run"""
+    stop = stop or threading.Event()
+    workers = [
+        Worker(f'{socket.gethostname()}:{os.getpid()}:{using}:{i}', batch, using)
+        for using in settings.NOTE_SHARDS for i in range(concurrency)
+    ]
+
+    def work(worker):
+        try:
+            worker.run(stop, burst, poll_interval)
+        finally:
+            connections.close_all()
+
+    def beat():
+        while not stopped.wait(settings.TASK_VISIBILITY_TIMEOUT / 3):
+            for worker in workers:
+                try:
+                    worker.heartbeat()
+                except DatabaseError:
+                    logger.exception('Task worker %s heartbeat failed', worker.name)
+        connections.close_all()
+
+    stopped = threading.Event()
+    threads = [
+        threading.Thread(target=work, args=(worker,), name=f'task-worker-{i}')
+        for i, worker in enumerate(workers)
+    ]
+    heart = threading.Thread(target=beat, name='task-heartbeat', daemon=True)
+    for thread in [*threads, heart]:
+        thread.start()
+    for thread in threads:
+        # With a timeout so the main thread still gets signals
+        while thread.is_alive():
+            thread.join(1)
+    stopped.set()
+    heart.join()
+    return sum(worker.ran for worker in workers)
+
+
+@task('notes.index_notes')
+def index_saved_notes(author_id, note_ids):
+    """Refresh the duplicate-search signatures of notes that were written"""
+    index_notes(Note.objects.filter(author_id=author_id, pk__in=note_ids).only('author_id', 'content'))
+
+
+@task('notes.purge_user', max_attempts=10)
+def purge_user(purge_id):
+    """Delete a disabled account's notes and then the account; picks up where a previous try stopped"""
+    purge = NotePurge.objects.filter(pk=purge_id).first()
+    if purge is not None:
+        run_purge(purge)
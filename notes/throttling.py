@@ -0,0 +1,151 @@
+"""
+Admission control: token-bucket rate limits and a concurrency cap.
+
+Buckets live in a SharedSlotFile so every worker process on the host draws
+from the same budget.  There are separate budgets for authentication
+endpoints ('auth'), reads and writes, configured as DRF-style rates in
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].  DRF views use the throttle
+classes below; the hand-rolled auth views use the throttle() decorator.
+"""
+import time
+from functools import lru_cache, wraps
+from threading import Lock
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .sharedmem import SharedSlotFile, fingerprint
+from .utils import error_response
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+buckets = SharedSlotFile(lambda: settings.THROTTLE_STATE_FILE, 'dd', settings.THROTTLE_SLOTS)
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'20/min' -> (capacity, tokens per second)"""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    return count, count / DURATIONS[period[0]]
+
+
+def last_used(values):
+    return values[1]
+
+
+def consume(key, rate):
+    """Take a token from key's bucket; return (allowed, seconds until one is available)"""
+    capacity, refill = parse_rate(rate)
+    now = time.time()
+    key_fingerprint = fingerprint(key)
+    with buckets.locked():
+        # Full buckets (the least recently used) are the cheapest to forget
+        index, (tokens, updated) = buckets.find(key_fingerprint, evict=last_used)
+        if updated:
+            tokens = min(capacity, tokens + max(0.0, now - updated) * refill)
+        else:
+            tokens = capacity
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        buckets.write(index, key_fingerprint, tokens, now)
+    return allowed, 0.0 if allowed else (1 - tokens) / refill
+
+
+def rate_for(scope):
+    return api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+
+
+def client_ident(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return 'ip:' + BaseThrottle().get_ident(request)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_scope(self, request):
+        return self.scope
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        scope = self.get_scope(request)
+        rate = rate_for(scope)
+        if rate is None:
+            return True
+        allowed, wait = consume(f'{scope}:{client_ident(request)}', rate)
+        if not allowed:
+            self.retry_after = wait
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class AuthRateThrottle(TokenBucketThrottle):
+    scope = 'auth'
+
+
+class AutosaveRateThrottle(TokenBucketThrottle):
+    scope = 'autosave'
+
+
+class NoteRateThrottle(TokenBucketThrottle):
+    """Separate budgets for reads and writes"""
+
+    def get_scope(self, request):
+        return 'read' if request.method in ('GET', 'HEAD', 'OPTIONS') else 'write'
+
+
+def throttle(scope):
+    """Apply a token-bucket budget to a plain Django view"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            rate = rate_for(scope)
+            if rate is not None:
+                allowed, wait = consume(f'{scope}:{client_ident(request)}', rate)
+                if not allowed:
+                    response = error_response('Too many requests', 429)
+                    response['Retry-After'] = str(max(1, round(wait)))
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapped_view
+    return decorator
+
+
+class ConcurrencyLimitMiddleware:
+    """Shed load once a worker is already handling MAX_CONCURRENT_REQUESTS.
+
+    Rejecting early with 503 and Retry-After keeps latency for admitted
+    requests flat instead of letting every request queue behind the rest.
+    The limit is per worker process.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = settings.MAX_CONCURRENT_REQUESTS
+        self.retry_after = str(settings.CONCURRENCY_RETRY_AFTER)
+        self.in_flight = 0
+        self.lock = Lock()
+
+    def __call__(self, request):
+        with self.lock:
+            if self.in_flight >= self.limit:
+                admitted = False
+            else:
+                admitted = True
+                self.in_flight += 1
+        if not admitted:
+            response = error_response('Server busy', 503)
+            response['Retry-After'] = self.retry_after
+            return response
+        try:
+            return self.get_response(request)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
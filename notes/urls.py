@@ -1,10 +1,10 @@
 from django.urls import path, include
 from django.contrib.auth.views import LogoutView
-from rest_framework_simplejwt.views import TokenRefreshView
-from rest_framework_simplejwt.views import TokenRefreshView,TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView
 from . import views
 from . import api_views
 from . import api_auth_views
+from .throttling import AuthRateThrottle
 
 urlpatterns = [
     # Web interface URLs
@@ -15,6 +15,7 @@ urlpatterns = [
     path('note/create/', views.NoteCreateView.as_view(), name='note_create'),
     path('note/<int:pk>/edit/', views.NoteUpdateView.as_view(), name='note_update'),
     path('note/<int:pk>/delete/', views.NoteDeleteView.as_view(), name='note_delete'),
+    path('metrics', views.metrics_view, name='metrics'),
     
     # JWT API URLs
     path('api/register/', api_auth_views.api_register, name='api_register'),
@@ -22,7 +23,7 @@ urlpatterns = [
     path('api/logout/', api_auth_views.api_logout, name='api_logout'),
 
 
-    path('api/token/', TokenObtainPairView.as_view(), name='api_token_obtain_pair'),
+    path('api/token/', TokenObtainPairView.as_view(throttle_classes=[AuthRateThrottle]), name='api_token_obtain_pair'),
 
     path('api/token/refresh/', api_auth_views.api_refresh_token, name='api_token_refresh'),
     
@@ -33,6 +34,12 @@ urlpatterns = [
         path('logout/', api_views.logout_view, name='drf_logout'),
         path('profile/', api_views.user_profile, name='drf_profile'),
         path('notes/', api_views.note_list_create, name='drf_note_list'),
+        path('notes/events/', api_views.note_events, name='drf_note_events'),
+        path('notes/suggest/', api_views.note_suggest, name='drf_note_suggest'),
         path('notes/<int:pk>/', api_views.note_detail, name='drf_note_detail'),
+        path('notes/<int:pk>/autosave/', api_views.note_autosave, name='drf_note_autosave'),
+        path('notes/<int:pk>/similar/', api_views.note_similar, name='drf_note_similar'),
+        path('profiling/', api_views.profile_dump_list, name='drf_profile_dump_list'),
+        path('profiling/<str:name>/', api_views.profile_dump_download, name='drf_profile_dump_download'),
     ])),
 ]
@@ -1,11 +1,10 @@
-import json
-from django.http import JsonResponse
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.exceptions import TokenError
+from django.http import HttpResponse
+from .fastjson import dumps, loads
 
 
 def get_tokens_for_user(user):
     """Generate JWT tokens for a user"""
+    from rest_framework_simplejwt.tokens import RefreshToken
     refresh = RefreshToken.for_user(user)
     return {
         'refresh': str(refresh),
@@ -24,6 +23,16 @@ def get_user_from_token(request):
         return None
 
 
+def parse_json(request):
+    """Decode a JSON request body"""
+    return loads(request.body)
+
+
+def json_response(data, status=200):
+    """JSON response encoded with notes.fastjson"""
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
 def token_response(tokens, user_data=None):
     """Create a standardized token response"""
     response_data = {
@@ -32,9 +41,9 @@ def token_response(tokens, user_data=None):
     }
     if user_data:
         response_data['user'] = user_data
-    return JsonResponse(response_data)
+    return json_response(response_data)
 
 
 def error_response(message, status_code=400):
     """Create a standardized error response"""
-    return JsonResponse({'error': message}, status=status_code)
+    return json_response({'error': message}, status=status_code)
@@ -4,21 +4,30 @@ from django.contrib.auth.views import LoginView
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
 from django.views.generic import (
     ListView, CreateView, UpdateView, DeleteView
 )
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import JsonResponse
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
-from rest_framework_simplejwt.tokens import RefreshToken
+from . import metrics
+from .archive import NoteTiers, get_note
+from .autosave import drafts
+from .cache import note_list_page_key
 from .models import Note
 from .forms import UserRegistrationForm, NoteForm
-from .utils import get_tokens_for_user, token_response, error_response
+from .throttling import throttle
+from .utils import get_tokens_for_user, token_response, error_response, json_response, parse_json
 
 
+@method_decorator(throttle('auth'), name='post')
 class CustomLoginView(LoginView):
     template_name = 'login.html'
     redirect_authenticated_user = True
@@ -31,8 +40,7 @@ class CustomLoginView(LoginView):
         # Check if it's an API request (JSON)
         if request.content_type == 'application/json':
             try:
-                import json
-                data = json.loads(request.body)
+                data = parse_json(request)
                 username = data.get('username')
                 password = data.get('password')
                 
@@ -57,13 +65,13 @@ class CustomLoginView(LoginView):
 
 
 @csrf_exempt
+@throttle('auth')
 def register_view(request):
     if request.method == 'POST':
         # Check if it's an API request (JSON)
         if request.content_type == 'application/json':
             try:
-                import json
-                data = json.loads(request.body)
+                data = parse_json(request)
                 form = UserRegistrationForm(data)
                 if form.is_valid():
                     user = form.save()
@@ -95,15 +103,15 @@ def register_view(request):
 def logout_view(request):
     # Check if it's an API request (JSON)
     if request.content_type == 'application/json':
+        from rest_framework_simplejwt.tokens import RefreshToken
         try:
-            import json
-            data = json.loads(request.body)
+            data = parse_json(request)
             refresh_token = data.get('refresh')
             if refresh_token:
                 try:
                     token = RefreshToken(refresh_token)
                     token.blacklist()
-                    return JsonResponse({'message': 'Logout successful'})
+                    return json_response({'message': 'Logout successful'})
                 except Exception as e:
                     return error_response('Invalid token', 400)
             else:
@@ -119,17 +127,18 @@ def logout_view(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
+@throttle('auth')
 def refresh_token_view(request):
     """Refresh JWT access token"""
+    from rest_framework_simplejwt.tokens import RefreshToken
     try:
-        import json
-        data = json.loads(request.body)
+        data = parse_json(request)
         refresh_token = data.get('refresh')
         
         if refresh_token:
             try:
                 token = RefreshToken(refresh_token)
-                return JsonResponse({
+                return json_response({
                     'access': str(token.access_token),
                     'refresh': str(token)
                 })
@@ -148,7 +157,33 @@ class NoteListView(LoginRequiredMixin, ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        return Note.objects.filter(author=self.request.user)
+        # Archived notes are listed too, merged in by updated_at
+        return NoteTiers(self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        # Flash messages and drafts held by this process are rendered into
+        # the page, so those renders can't be shared
+        page = request.GET.get(self.page_kwarg, '1')
+        if (len(messages.get_messages(request)) or not (page.isdigit() or page == 'last')
+                or drafts.pending_for(request.user.pk)):
+            return super().get(request, *args, **kwargs)
+        key = note_list_page_key(request.user.pk, page)
+        content = cache.get(key)
+        metrics.inc('noteapp_cache_requests_total', cache='note_list_page',
+                    result='miss' if content is None else 'hit')
+        if content is not None:
+            return HttpResponse(content)
+        response = super().get(request, *args, **kwargs)
+        response.render()
+        if response.status_code == 200:
+            cache.set(key, response.content, settings.NOTE_LIST_CACHE_TIMEOUT)
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        drafts.apply(context['object_list'])
+        context['note_card_cache_timeout'] = settings.NOTE_CARD_CACHE_TIMEOUT
+        return context
 
 
 class NoteCreateView(LoginRequiredMixin, CreateView):
@@ -163,28 +198,47 @@ class NoteCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class NoteUpdateView(LoginRequiredMixin, UpdateView):
+class ArchiveFallbackMixin:
+    """Finds notes in the archive as well; a POST restores an archived note before changing it"""
+
+    def get_object(self, queryset=None):
+        try:
+            return get_note(self.request.user.pk, self.kwargs['pk'], restore=self.request.method == 'POST')
+        except Note.DoesNotExist:
+            raise Http404('Note not found')
+
+
+class NoteUpdateView(LoginRequiredMixin, ArchiveFallbackMixin, UpdateView):
     model = Note
     form_class = NoteForm
     template_name = 'note_form.html'
     success_url = reverse_lazy('note_list')
 
-    def get_queryset(self):
-        return Note.objects.filter(author=self.request.user)
+    def get_object(self, queryset=None):
+        return drafts.apply([super().get_object(queryset)])[0]
 
     def form_valid(self, form):
+        # An explicit save supersedes any autosaved draft
+        drafts.discard(self.object.pk)
         messages.success(self.request, 'Note updated successfully!')
         return super().form_valid(form)
 
 
-class NoteDeleteView(LoginRequiredMixin, DeleteView):
+class NoteDeleteView(LoginRequiredMixin, ArchiveFallbackMixin, DeleteView):
     model = Note
     template_name = 'note_confirm_delete.html'
     success_url = reverse_lazy('note_list')
 
-    def get_queryset(self):
-        return Note.objects.filter(author=self.request.user)
-
     def delete(self, request, *args, **kwargs):
         messages.success(request, 'Note deleted successfully!')
         return super().delete(request, *args, **kwargs)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires METRICS_TOKEN as a bearer token when set"""
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return error_response('Authentication required', 401)
+    return HttpResponse(
+        metrics.render(metrics.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,6 +1,6 @@
 #!/bin/bash
 # Django NoteApp Startup Script
-# This script runs database migrations and starts the Django development server
+# This script runs database migrations and starts the task worker and the ASGI server
 
 set -e
 
@@ -9,15 +9,28 @@ echo ""
 echo "Creating data directory if needed..."
 mkdir -p data
 
-echo "Running database migrations..."
-python manage.py migrate --noinput || true
+echo "Migrating databases and collecting static files if needed..."
+python manage.py prepare_startup
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput --clear || true
+echo "Starting background task worker..."
+python manage.py run_worker &
+worker=$!
 
 echo ""
-echo "Starting Django development server on 0.0.0.0:8000..."
+echo "Starting the ASGI server on 0.0.0.0:8000..."
 echo "Visit: http://localhost:8000"
 echo ""
-python manage.py runserver 0.0.0.0:8000
+# The ASGI app also serves the note event stream (NOTE_EVENTS_PATH).  With
+# DEBUG off {% static %} links the hashed names, which StaticAssetMiddleware
+# serves with cache headers and precompressed copies.
+DJANGO_DEBUG=False uvicorn note_project.asgi:application --host 0.0.0.0 --port 8000 &
+server=$!
 
+# As the container's PID 1 bash would not pass docker stop's SIGTERM on.
+# Hand it to both so uvicorn shuts down cleanly (pending autosave drafts
+# are written at exit) and the worker finishes the task it is running.
+trap 'kill -TERM "$server" "$worker" 2>/dev/null' TERM INT
+wait "$server" || true  # returns early when a signal arrives
+wait "$server" || true
+kill -TERM "$worker" 2>/dev/null || true
+wait "$worker" || true
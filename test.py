@@ -24,9 +24,26 @@ import pytest
 from django.conf import settings
 from django.core import management
 from django.db import connection
+from django.core.paginator import EmptyPage
 from django.urls import reverse
 
 
+@pytest.fixture(autouse=True)
+def _isolated_caches(settings, tmp_path):
+    """Cache entries keyed on user ids, throttle buckets and metrics would otherwise leak between tests.
+
+    Background tasks run inline unless a test turns the queue back on.
+    """
+    from django.core.cache import cache
+
+    settings.THROTTLE_STATE_FILE = tmp_path / "throttle.bin"
+    settings.METRICS_STATE_FILE = tmp_path / "metrics.bin"
+    settings.TASK_QUEUE_EAGER = True
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.mark.django_db
 class TestJWTAuthentication:
     """JWT auth flows: register, login, token refresh, invalid token handling."""
@@ -180,6 +197,823 @@ class TestMigrationsAndIntegrity:
         assert any(name.endswith("notes_note") or name.endswith("note") for name in tables)
 
 
+@pytest.mark.django_db
+class TestNotePurge:
+    """Batched purge of an account's notes."""
+
+    def test_purge_disables_user_then_deletes_notes_in_batches(self):
+        from django.contrib.auth.models import User
+        from notes.models import Note, NotePurge
+        from notes.purge import run_purge, schedule_user_purge
+
+        user = User.objects.create_user("purged", password="x")
+        keeper = User.objects.create_user("keeper", password="x")
+        Note.objects.bulk_create(Note(title=f"n{i}", content="c", author=user) for i in range(25))
+        Note.objects.create(title="kept", content="c", author=keeper)
+
+        purge = schedule_user_purge(user)
+        user.refresh_from_db()
+        assert user.is_active is False
+
+        purge = run_purge(purge, batch_size=10, delay=0)
+        assert purge.notes_deleted == 25
+        assert purge.completed_at is not None
+        assert not User.objects.filter(username="purged").exists()
+        assert list(Note.objects.values_list("title", flat=True)) == ["kept"]
+        assert NotePurge.objects.get(pk=purge.pk).username == "purged"
+
+
+@pytest.mark.django_db
+class TestNoteAdmin:
+    """Admin changelist uses full-text search, the author autocomplete filter and estimated counts."""
+
+    def test_changelist_search_and_author_filter(self, client):
+        from django.contrib.auth.models import User
+        from notes.models import Note
+
+        admin_user = User.objects.create_superuser("root", "root@ex.com", "x")
+        other = User.objects.create_user("other", password="x")
+        Note.objects.create(title="Groceries", content="buy oranges", author=admin_user)
+        Note.objects.create(title="Travel", content="pack bananas", author=other)
+        client.force_login(admin_user)
+
+        resp = client.get("/admin/notes/note/", {"q": "orang"})
+        assert resp.status_code == 200
+        assert [n.title for n in resp.context["cl"].result_list] == ["Groceries"]
+
+        resp = client.get("/admin/notes/note/", {"author__id__exact": other.pk})
+        assert resp.status_code == 200
+        assert [n.title for n in resp.context["cl"].result_list] == ["Travel"]
+        assert b'id="author-filter"' in resp.content
+
+    def test_deleting_users_and_notes_skips_the_cascade(self, client, settings):
+        from django.contrib.auth.models import User
+        from notes.models import Note, NotePurge, Task
+
+        settings.TASK_QUEUE_EAGER = False
+        admin_user = User.objects.create_superuser("root", "root@ex.com", "x")
+        owner = User.objects.create_user("owner", password="x")
+        Note.objects.bulk_create(Note(title=f"n{i}", content="c", author=owner) for i in range(5))
+        client.force_login(admin_user)
+
+        for url in ("/admin/auth/user/", "/admin/notes/note/"):
+            actions = dict(client.get(url).context["action_form"].fields["action"].choices)
+            assert "delete_selected" not in actions
+        assert client.get(f"/admin/auth/user/{owner.pk}/delete/").status_code == 200
+        client.post(f"/admin/auth/user/{owner.pk}/delete/", {"post": "yes"})
+        owner.refresh_from_db()
+        assert owner.is_active is False
+        assert NotePurge.objects.filter(user=owner).exists()
+        assert Task.objects.filter(name="notes.purge_user").exists()
+        assert Note.objects.count() == 5
+
+    def test_capped_count_keeps_paging(self, client, monkeypatch):
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from notes.admin import NoteAdmin
+        from notes.pagination import EstimatedCountPaginator
+
+        monkeypatch.setattr(EstimatedCountPaginator, "count_limit", 10)
+        monkeypatch.setattr(NoteAdmin, "list_per_page", 10)
+        owner = User.objects.create_user("prolific", password="x")
+        Note.objects.bulk_create(Note(title=f"n{i}", content="c", author=owner) for i in range(25))
+        paginator = EstimatedCountPaginator(Note.objects.filter(author=owner).order_by("pk"), 10)
+        assert paginator.count == 11 and paginator.capped
+        assert paginator.page(2).has_next()
+        last = paginator.page(3)
+        assert len(last) == 5 and not last.has_next()
+        with pytest.raises(EmptyPage):
+            paginator.page(4)
+
+        client.force_login(User.objects.create_superuser("root", "root@ex.com", "x"))
+        resp = client.get("/admin/notes/note/", {"author__id__exact": owner.pk, "p": 3})
+        assert resp.status_code == 200
+        assert len(resp.context["cl"].result_list) == 5
+        assert b"10+ notes" in resp.content
+
+
+@pytest.mark.django_db
+class TestNoteListCache:
+    """The note list page is cached per user and invalidated by note writes."""
+
+    def test_page_cache_follows_note_generation(self, client, django_assert_max_num_queries):
+        from django.contrib.auth.models import User
+        from django.db.models import F
+        from django.utils import timezone
+        from notes.models import Note, NoteGeneration
+
+        user = User.objects.create_user("reader", password="x")
+        Note.objects.create(title="First note", content="c", author=user)
+        client.force_login(user)
+
+        assert b"First note" in client.get("/").content
+        with django_assert_max_num_queries(3):  # session, user and the note generation
+            assert b"First note" in client.get("/").content
+
+        Note.objects.create(title="Second note", content="c", author=user)
+        assert b"Second note" in client.get("/").content
+
+        # Another process (the task worker, a command) edits without this process's signals
+        Note.objects.filter(title="Second note").update(title="Renamed elsewhere", updated_at=timezone.now())
+        NoteGeneration.objects.filter(author=user).update(generation=F("generation") + 1)
+        assert b"Renamed elsewhere" in client.get("/").content
+
+
+class TestStaticAssets:
+    """collectstatic writes hashed, precompressed files that are served with long-lived caching."""
+
+    def test_hashed_gzip_asset_is_served_with_cache_headers(self, client, settings, tmp_path):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+
+        settings.STATIC_ROOT = tmp_path
+        management.call_command("collectstatic", interactive=False, verbosity=0)
+        hashed = staticfiles_storage.stored_name("css/style.css")
+        assert hashed != "css/style.css"
+        assert (tmp_path / (hashed + ".gz")).exists()
+
+        resp = client.get(f"/static/{hashed}", HTTP_ACCEPT_ENCODING="gzip, deflate")
+        assert resp.status_code == 200
+        assert resp["Content-Encoding"] == "gzip"
+        assert resp["Content-Type"].startswith("text/css")
+        assert "immutable" in resp["Cache-Control"]
+        assert "Accept-Encoding" in resp["Vary"]
+
+        resp = client.get(f"/static/{hashed}", HTTP_IF_NONE_MATCH=resp["ETag"], HTTP_ACCEPT_ENCODING="gzip")
+        assert resp.status_code == 304
+
+        resp = client.get("/static/css/style.css")
+        assert resp.status_code == 200 and "Content-Encoding" not in resp
+        assert "immutable" not in resp["Cache-Control"]
+
+
+@pytest.mark.django_db
+class TestApiCompression:
+    """API responses are gzipped above a size threshold, including streamed ones."""
+
+    def test_list_is_gzipped_and_tiny_detail_is_not(self, client):
+        import gzip
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from notes.utils import get_tokens_for_user
+
+        user = User.objects.create_user("gzipper", password="x")
+        notes = [Note.objects.create(title=f"n{i}", content="words " * 50, author=user) for i in range(20)]
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {get_tokens_for_user(user)['access']}"}
+
+        resp = client.get("/api/v1/notes/", HTTP_ACCEPT_ENCODING="gzip", **auth)
+        assert resp.status_code == 200
+        assert resp["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in resp["Vary"]
+        assert len(json.loads(gzip.decompress(resp.content))) == 20
+
+        Note.objects.filter(pk=notes[0].pk).update(content="short")
+        resp = client.get(f"/api/v1/notes/{notes[0].pk}/", HTTP_ACCEPT_ENCODING="gzip", **auth)
+        assert "Content-Encoding" not in resp
+
+    def test_streaming_response_is_compressed_incrementally(self, rf):
+        import gzip
+        from django.http import StreamingHttpResponse
+        from notes.middleware import ApiCompressionMiddleware
+
+        chunks = [b"chunk %d " % i * 100 for i in range(5)]
+        middleware = ApiCompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks)))
+        resp = middleware(rf.get("/api/v1/export/", HTTP_ACCEPT_ENCODING="gzip"))
+        assert resp["Content-Encoding"] == "gzip"
+        body = list(resp.streaming_content)
+        assert len(body) > 1
+        assert gzip.decompress(b"".join(body)) == b"".join(chunks)
+
+    def test_compressed_length_is_padded_against_breach(self, rf):
+        import gzip
+        from django.http import HttpResponse
+        from notes.middleware import ApiCompressionMiddleware
+
+        body = b"secret token " * 200
+        middleware = ApiCompressionMiddleware(lambda request: HttpResponse(body))
+        responses = [middleware(rf.get("/api/v1/notes/", HTTP_ACCEPT_ENCODING="gzip")) for _ in range(20)]
+        assert all(gzip.decompress(resp.content) == body for resp in responses)
+        assert len({len(resp.content) for resp in responses}) > 1
+
+
+class TestFastJSON:
+    """notes.fastjson matches DRF's datetime format on both the orjson and stdlib paths."""
+
+    def test_datetimes_match_drf_iso_format(self):
+        from datetime import datetime, timezone as dt_timezone
+        from rest_framework.fields import DateTimeField
+        from notes import fastjson
+
+        for value in (datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+                      datetime(2024, 1, 2, 3, 4, 5, 123, tzinfo=dt_timezone.utc)):
+            expected = DateTimeField(format="iso-8601").to_representation(value)
+            assert json.loads(fastjson.dumps({"t": value})) == {"t": expected}
+            assert json.loads(fastjson.stdlib_dumps({"t": value})) == {"t": expected}
+
+    def test_invalid_json_body_is_rejected(self, client):
+        resp = client.post("/api/login/", data="{not json", content_type="application/json")
+        assert resp.status_code == 400
+        assert resp.json() == {"error": "Invalid JSON data"}
+
+
+class TestNoteEvents:
+    """SSE change feed: signal-driven events, Last-Event-ID resume and the ASGI endpoint."""
+
+    @pytest.mark.django_db
+    def test_note_signals_reach_subscriber_and_resume(self, django_capture_on_commit_callbacks):
+        import asyncio
+        from django.contrib.auth.models import User
+        from notes.events import broker
+        from notes.models import Note
+
+        user = User.objects.create_user("listener", password="x")
+        loop = asyncio.new_event_loop()
+        subscription, backlog = broker.subscribe(user.pk, loop)
+        try:
+            with django_capture_on_commit_callbacks(execute=True):
+                note = Note.objects.create(title="Live", content="c", author=user)
+            with django_capture_on_commit_callbacks(execute=True):
+                note.delete()
+            events = loop.run_until_complete(subscription.wait(timeout=1))
+        finally:
+            broker.unsubscribe(subscription)
+            loop.close()
+        assert backlog == []
+        assert [e.type for e in events] == ["note.created", "note.deleted"]
+
+        resumed, backlog = broker.subscribe(user.pk, None, broker.event_id(events[0]))
+        broker.unsubscribe(resumed)
+        assert [e.type for e in backlog] == ["note.deleted"]
+        stale, backlog = broker.subscribe(user.pk, None, "0-1")
+        broker.unsubscribe(stale)
+        assert backlog is None
+
+    def test_asgi_stream_delivers_events_until_disconnect(self, monkeypatch):
+        import asyncio
+        from note_project.asgi import application
+        from notes import events
+
+        monkeypatch.setattr(events, "authenticate_token", lambda raw: 42 if raw == "good" else None)
+
+        async def run(token):
+            sent, incoming = [], asyncio.Queue()
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/notes/events/",
+                     "headers": [], "query_string": f"token={token}".encode()}
+
+            async def send(message):
+                sent.append(message)
+                if message.get("body", b"").startswith(b"retry"):
+                    events.broker.publish(42, "note.updated", {"id": 7})
+                elif b"note.updated" in message.get("body", b""):
+                    await incoming.put({"type": "http.disconnect"})
+
+            await asyncio.wait_for(application(scope, incoming.get, send), timeout=5)
+            return sent
+
+        sent = asyncio.run(run("bad"))
+        assert sent[0]["status"] == 401
+
+        sent = asyncio.run(run("good"))
+        assert sent[0]["status"] == 200
+        assert (b"content-type", b"text/event-stream") in sent[0]["headers"]
+        assert b'event: note.updated\ndata: {"id":7}' in b"".join(m.get("body", b"") for m in sent)
+        assert events.broker.subscriber_count() == 0
+
+    def test_asgi_stream_answers_cors_for_allowed_origins(self, monkeypatch):
+        import asyncio
+        from note_project.asgi import application
+        from notes import events
+
+        monkeypatch.setattr(events, "authenticate_token", lambda raw: None)
+
+        def response_headers(origin):
+            sent = []
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/notes/events/",
+                     "headers": [(b"origin", origin.encode())], "query_string": b"token=bad"}
+
+            async def send(message):
+                sent.append(message)
+
+            asyncio.run(application(scope, None, send))
+            return dict(sent[0]["headers"])
+
+        allowed = response_headers("http://localhost:3000")
+        assert allowed[b"access-control-allow-origin"] == b"http://localhost:3000"
+        assert allowed[b"access-control-allow-credentials"] == b"true"
+        assert b"access-control-allow-origin" not in response_headers("http://evil.example")
+
+
+@pytest.mark.django_db
+class TestNoteSharding:
+    """Author-scoped note queries and writes are routed to the author's recorded shard."""
+
+    def test_author_queries_follow_the_shard_map(self, settings):
+        from django.contrib.auth.models import User
+        from notes.models import AuthorShard, Note
+        from notes.routers import NoteShardRouter
+        from notes.sharding import default_shard_for_author, forget_shard
+
+        legacy = User.objects.create_user("legacy", password="x")
+        Note.objects.create(title="old", content="c", author=legacy)
+        fresh = User.objects.create_user("fresh", password="x")
+
+        settings.NOTE_SHARDS = ["default", "notes_shard_1", "notes_shard_2"]
+        forget_shard(legacy.pk)
+        forget_shard(fresh.pk)
+        try:
+            # Notes written before sharding stay on default
+            assert Note.objects.filter(author=legacy).db == "default"
+            expected = default_shard_for_author(fresh.pk)
+            assert Note.objects.filter(author_id=fresh.pk).db == expected
+            assert AuthorShard.objects.get(author=fresh).shard == expected
+            assert NoteShardRouter().db_for_write(Note, instance=Note(author=fresh)) == expected
+            assert NoteShardRouter().db_for_read(User, instance=Note(author=fresh)) == "default"
+        finally:
+            forget_shard(legacy.pk)
+            forget_shard(fresh.pk)
+
+    def test_admin_reads_the_filtered_authors_shard(self, settings, rf):
+        from django.contrib import admin
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from notes.sharding import default_shard_for_author, forget_shard
+
+        author = User.objects.create_user("sharded", password="x")
+        settings.NOTE_SHARDS = ["default", "notes_shard_1", "notes_shard_2"]
+        forget_shard(author.pk)
+        try:
+            model_admin = admin.site._registry[Note]
+            request = rf.get("/admin/notes/note/", {"author__id__exact": str(author.pk)})
+            assert model_admin.get_queryset(request).db == default_shard_for_author(author.pk)
+            assert model_admin.get_queryset(rf.get("/admin/notes/note/")).db == "default"
+        finally:
+            forget_shard(author.pk)
+
+
+@pytest.mark.django_db
+class TestAdmissionControl:
+    """Token-bucket budgets answer 429 with Retry-After; the concurrency cap sheds with 503."""
+
+    def test_auth_budget_is_shared_across_endpoints(self, client, settings):
+        settings.REST_FRAMEWORK = {
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {"auth": "2/min", "read": "600/min", "write": "120/min"},
+        }
+        body = json.dumps({"username": "nobody", "password": "wrong"})
+        assert client.post(reverse("api_login"), body, content_type="application/json").status_code == 401
+        assert client.post(reverse("api_token_obtain_pair"), body, content_type="application/json").status_code == 401
+
+        resp = client.post(reverse("api_login"), body, content_type="application/json")
+        assert resp.status_code == 429
+        assert int(resp["Retry-After"]) >= 1
+        resp = client.post(reverse("api_token_obtain_pair"), body, content_type="application/json")
+        assert resp.status_code == 429
+        assert "Retry-After" in resp
+
+    def test_concurrency_limit_sheds_load(self, rf, settings):
+        from django.http import HttpResponse
+        from notes.throttling import ConcurrencyLimitMiddleware
+
+        settings.MAX_CONCURRENT_REQUESTS = 1
+        responses = []
+
+        def inner(request):
+            responses.append(middleware(rf.get("/")))
+            return HttpResponse("ok")
+
+        middleware = ConcurrencyLimitMiddleware(inner)
+        assert middleware(rf.get("/")).status_code == 200
+        assert responses[0].status_code == 503
+        assert responses[0]["Retry-After"] == str(settings.CONCURRENCY_RETRY_AFTER)
+        assert middleware.in_flight == 0
+
+
+@pytest.mark.django_db
+class TestRequestProfiling:
+    """Selected requests leave a profile that staff can list and download."""
+
+    def test_profiled_route_dump_is_served_to_staff(self, client, settings, tmp_path):
+        import pstats
+        from django.contrib.auth.models import User
+
+        settings.NOTE_PROFILE_PATHS = ["/api/v1/notes/"]
+        settings.NOTE_PROFILE_DIR = tmp_path / "profiles"
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        staff = User.objects.create_user("ops", password="x", is_staff=True)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(staff).access_token}"}
+
+        client.get(reverse("drf_profile"), **auth)
+        assert not (tmp_path / "profiles").exists()
+        client.get(reverse("drf_note_list"), **auth)
+
+        listing = client.get(reverse("drf_profile_dump_list"), **auth).json()
+        assert len(listing) == 1 and listing[0]["name"].endswith(".prof")
+        resp = client.get(reverse("drf_profile_dump_download", args=[listing[0]["name"]]), **auth)
+        assert resp.status_code == 200
+        path = tmp_path / "dump.prof"
+        path.write_bytes(b"".join(resp.streaming_content))
+        assert pstats.Stats(str(path)).total_calls > 0
+
+        plain = User.objects.create_user("plain", password="x")
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(plain).access_token}"}
+        assert client.get(reverse("drf_profile_dump_list"), **auth).status_code == 403
+
+    def test_stack_sampler_writes_collapsed_stacks(self, tmp_path):
+        import time
+        from notes.profiling import StackSampler
+
+        sampler = StackSampler(0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        sampler.stop()
+        sampler.dump(tmp_path / "out.collapsed")
+        lines = (tmp_path / "out.collapsed").read_text().splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert any("test_stack_sampler_writes_collapsed_stacks" in line for line in lines)
+
+
+@pytest.mark.django_db
+class TestPrepareStartup:
+    """prepare_startup skips migrate and collectstatic when they have nothing to do."""
+
+    def test_skips_work_that_is_already_done(self, settings, tmp_path):
+        from io import StringIO
+        from notes.startup import disk_migrations, unmigrated_databases
+
+        assert ("notes", "0001_initial") in disk_migrations()
+        assert unmigrated_databases() == []
+
+        settings.STATIC_ROOT = tmp_path / "static"
+        out = StringIO()
+        management.call_command("prepare_startup", stdout=out)
+        assert "Migrations up to date" in out.getvalue()
+        assert "Collecting static files" in out.getvalue()
+        assert (tmp_path / "static" / "staticfiles.json").is_file()
+
+        out = StringIO()
+        management.call_command("prepare_startup", stdout=out)
+        assert "Static files up to date" in out.getvalue()
+
+        (tmp_path / "static" / "staticfiles.json").unlink()
+        out = StringIO()
+        management.call_command("prepare_startup", stdout=out)
+        assert "Collecting static files" in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Per-route counters and latency histograms are exposed in Prometheus text format."""
+
+    def test_note_detail_requests_are_counted(self, client, settings):
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        user = User.objects.create_user("metered", password="x")
+        note = Note.objects.create(title="t", content="c", author=user)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        for _ in range(3):
+            assert client.get(reverse("drf_note_detail", args=[note.pk]), **auth).status_code == 200
+        client.post(reverse("api_login"), json.dumps({"username": "metered", "password": "bad"}),
+                    content_type="application/json")
+
+        settings.METRICS_TOKEN = "scrape"
+        assert client.get("/metrics").status_code == 401
+        body = client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape").content.decode()
+        assert 'noteapp_http_requests_total{route="drf_note_detail",method="GET",status="200"} 3' in body
+        assert 'noteapp_http_request_duration_seconds_bucket{route="drf_note_detail",le="+Inf"} 3' in body
+        assert 'noteapp_http_request_duration_seconds_count{route="drf_note_detail"} 3' in body
+        assert re.search(r'noteapp_db_queries_total\{route="drf_note_detail"\} [1-9]', body)
+        assert 'noteapp_auth_attempts_total{route="api_login",result="failure"} 1' in body
+
+    def test_histogram_buckets_are_cumulative(self):
+        from notes import metrics
+
+        values = dict(metrics.latency_updates("noteapp_http_request_duration_seconds", 0.003, route="r"))
+        for key, amount in metrics.latency_updates("noteapp_http_request_duration_seconds", 0.2, route="r"):
+            values[key] = values.get(key, 0) + amount
+        body = metrics.render(values)
+        assert 'noteapp_http_request_duration_seconds_bucket{route="r",le="0.005"} 1' in body
+        assert 'noteapp_http_request_duration_seconds_bucket{route="r",le="0.1"} 1' in body
+        assert 'noteapp_http_request_duration_seconds_bucket{route="r",le="0.25"} 2' in body
+        assert 'noteapp_http_request_duration_seconds_sum{route="r"} 0.203' in body
+
+
+@pytest.mark.django_db
+class TestAutosave:
+    """Autosaved drafts are visible at once but reach the database at most once per interval."""
+
+    def test_drafts_are_coalesced_into_one_write(self, client, settings):
+        from django.contrib.auth.models import User
+        from notes.autosave import drafts
+        from notes.models import Note
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        settings.NOTE_AUTOSAVE_INTERVAL = 3600
+        user = User.objects.create_user("writer", password="x")
+        note = Note.objects.create(title="t", content="", author=user)
+        saved_at = note.updated_at
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        url = reverse("drf_note_autosave", args=[note.pk])
+        try:
+            for i in range(20):
+                resp = client.put(url, json.dumps({"content": "x" * i}), content_type="application/json", **auth)
+                assert resp.status_code == 202
+            detail = client.get(reverse("drf_note_detail", args=[note.pk]), **auth).json()
+            assert detail["content"] == "x" * 19
+            client.force_login(user)
+            assert b"x" * 19 in client.get(reverse("note_list")).content
+            note.refresh_from_db()
+            assert note.content == "" and note.updated_at == saved_at
+
+            flushes = drafts.flushes
+            assert drafts.flush_due() == 0
+            assert drafts.flush_all() == 1
+            assert drafts.flushes == flushes + 1
+            note.refresh_from_db()
+            assert note.content == "x" * 19 and note.updated_at > saved_at
+
+            other = User.objects.create_user("other", password="x")
+            auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(other).access_token}"}
+            assert client.put(url, json.dumps({"content": "y"}), content_type="application/json", **auth).status_code == 404
+        finally:
+            drafts.discard(note.pk)
+
+    def test_stale_draft_does_not_overwrite_explicit_save(self, settings):
+        from django.contrib.auth.models import User
+        from notes.autosave import drafts
+        from notes.models import Note
+
+        user = User.objects.create_user("saver", password="x")
+        note = Note.objects.create(title="t", content="old", author=user)
+        drafts.stash(note.pk, user.pk, {"content": "draft"})
+        # Another worker saves explicitly after the draft arrived
+        note.content = "saved"
+        note.save()
+        assert drafts.flush_all() == 0
+        note.refresh_from_db()
+        assert note.content == "saved"
+
+
+@pytest.mark.django_db
+class TestTitleSuggest:
+    """Title suggestions match prefixes case- and accent-insensitively through the index or the cache."""
+
+    @pytest.mark.parametrize("cached_users", [0, 32])
+    def test_prefix_matches_normalized_titles(self, client, settings, cached_users):
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from notes.suggest import title_cache
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        settings.NOTE_SUGGEST_CACHE_USERS = cached_users
+        title_cache.clear()
+        user = User.objects.create_user("typist", password="x")
+        other = User.objects.create_user("someone", password="x")
+        for title in ["Élan vital", "elephant", "Eleanor", "apple"]:
+            Note.objects.create(title=title, content="c", author=user)
+        Note.objects.create(title="Elegy", content="c", author=other)
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+        def suggest(prefix, **params):
+            resp = client.get(reverse("drf_note_suggest"), {"prefix": prefix, **params}, **auth)
+            return [item["title"] for item in resp.json()]
+
+        assert suggest("ELE") == ["Eleanor", "elephant"]
+        assert suggest("él") == ["Élan vital", "Eleanor", "elephant"]
+        assert suggest("el", limit=1) == ["Élan vital"]
+        assert suggest("z") == []
+
+        note = Note.objects.get(title="apple")
+        note.title = "Elk"
+        note.save()
+        assert suggest("el") == ["Élan vital", "Eleanor", "elephant", "Elk"]
+
+        # Prefixes ending in the last code point, or just before the surrogates
+        Note.objects.create(title="x\U0010ffff", content="c", author=user)
+        assert suggest("x\U0010ffff") == ["x\U0010ffff"]
+        assert suggest("\ud7ff") == []
+
+    def test_prefix_query_is_an_index_range_scan(self):
+        from notes.suggest import normalize_title, prefix_upper_bound
+        from notes.models import Note
+
+        assert normalize_title("Ärger STRASSE") == "arger strasse"
+        assert prefix_upper_bound("ab") == "ac"
+        assert prefix_upper_bound("a\ud7ff") == "a\ue000"
+        assert prefix_upper_bound("a\U0010ffff") == "b"
+        assert prefix_upper_bound("\U0010ffff") is None
+        plan = Note.objects.filter(
+            author_id=1, title_normalized__gte="ab", title_normalized__lt="ac",
+        ).order_by("title_normalized").explain()
+        assert "notes_note_author_title_idx" in plan
+
+
+@pytest.mark.django_db
+class TestDuplicateDetection:
+    """Saved notes are MinHash-indexed so near-duplicates are found through LSH buckets."""
+
+    TEXT = " ".join(f"word{i}" for i in range(200))
+
+    def test_similar_endpoint_and_command(self, client):
+        from io import StringIO
+        from django.contrib.auth.models import User
+        from notes.models import Note, NoteLSHBucket
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        user = User.objects.create_user("importer", password="x")
+        original = Note.objects.create(title="original", content=self.TEXT, author=user)
+        copy = Note.objects.create(title="copy", content=self.TEXT + " extra words", author=user)
+        Note.objects.bulk_create([Note(title="bulk copy", content=self.TEXT, author=user)])
+        Note.objects.create(title="different", content="something else entirely " * 20, author=user)
+        assert NoteLSHBucket.objects.filter(note=original).count() == 16
+
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        similar = client.get(reverse("drf_note_similar", args=[original.pk]), **auth).json()
+        assert [item["title"] for item in similar] == ["bulk copy", "copy"]
+        assert similar[0]["similarity"] == 1.0 and similar[1]["similarity"] >= 0.8
+
+        out = StringIO()
+        management.call_command("find_duplicates", stdout=out)
+        assert f'author {user.pk}: {original.pk} "original", {copy.pk} "copy"' in out.getvalue()
+        assert "1 duplicate groups found." in out.getvalue()
+
+        # Editing the copy away from the original re-indexes it
+        copy.content = "now unrelated text about gardening " * 10
+        copy.save()
+        similar = client.get(reverse("drf_note_similar", args=[original.pk]), **auth).json()
+        assert [item["title"] for item in similar] == ["bulk copy"]
+
+    def test_many_identical_notes_form_one_group(self):
+        from django.contrib.auth.models import User
+        from notes.models import Note
+        from notes.similarity import duplicate_groups
+
+        user = User.objects.create_user("bulk_importer", password="x")
+        Note.objects.bulk_create([Note(title=f"copy {i}", content=self.TEXT, author=user) for i in range(500)])
+        near = Note.objects.create(title="near", content=self.TEXT + " extra words", author=user)
+        Note.objects.create(title="different", content="something else entirely " * 20, author=user)
+
+        [group] = duplicate_groups(user.pk)
+        assert len(group) == 501 and near.pk in group
+
+    def test_numpy_and_python_signatures_agree(self, monkeypatch):
+        from notes import similarity
+
+        hashes = similarity.shingles(self.TEXT)
+        signature = similarity.minhash(hashes)
+        monkeypatch.setattr(similarity, "numpy", None)
+        assert similarity.minhash(hashes) == signature
+        assert similarity.estimated_similarity(signature, signature) == 1.0
+
+
+@pytest.mark.django_db
+class TestTaskQueue:
+    """Signals queue work in the task table; workers claim it atomically, retry with backoff and take over stalled claims."""
+
+    def test_note_save_queues_indexing_for_the_worker(self, settings):
+        from django.contrib.auth.models import User
+        from notes.models import Note, NoteSignature, Task
+        from notes.tasks import Worker
+
+        settings.TASK_QUEUE_EAGER = False
+        user = User.objects.create_user("queued", password="x")
+        note = Note.objects.create(title="t", content="some words to index", author=user)
+        Note.objects.bulk_create([Note(title="b", content="more words", author=user)])
+        assert list(Task.objects.values_list("name", "status")) == [("notes.index_notes", "queued")] * 2
+        assert not NoteSignature.objects.exists()
+
+        assert Worker().run(burst=True) == 2
+        assert NoteSignature.objects.filter(note=note).exists()
+        assert NoteSignature.objects.count() == 2
+        assert not Task.objects.exists()
+
+        note.title = "renamed"
+        note.save(update_fields=["title"])
+        assert not Task.objects.exists()
+
+    def test_every_shard_has_its_own_queue_and_workers(self, settings, monkeypatch):
+        from notes import tasks
+        from notes.routers import NoteShardRouter
+
+        settings.NOTE_SHARDS = ["default", "notes_shard_1"]
+        assert NoteShardRouter().allow_migrate("notes_shard_1", "notes", model_name="task")
+        assert not NoteShardRouter().allow_migrate("notes_shard_1", "notes", model_name="notepurge")
+
+        queues = []
+        monkeypatch.setattr(tasks.Worker, "run", lambda worker, *args: queues.append(worker.using) or 0)
+        tasks.run_workers(concurrency=2, burst=True)
+        assert sorted(queues) == ["default", "default", "notes_shard_1", "notes_shard_1"]
+
+    def test_retry_backoff_and_expired_claims(self, settings):
+        from datetime import timedelta
+        from django.utils import timezone
+        from notes.models import Task
+        from notes.tasks import Worker, enqueue, task
+
+        settings.TASK_QUEUE_EAGER = False
+        calls = []
+
+        @task("tests.flaky", max_attempts=2)
+        def flaky(value):
+            calls.append(value)
+            if len(calls) == 1:
+                raise RuntimeError("first try fails")
+
+        first, second = Worker("first"), Worker("second")
+        queued = enqueue("tests.flaky", 1)
+        assert first.run_once() == 1
+        queued.refresh_from_db()
+        assert (queued.status, queued.attempts) == ("queued", 1)
+        assert "first try fails" in queued.last_error
+        assert queued.run_at > timezone.now()
+        assert second.claim() == []
+
+        Task.objects.update(run_at=timezone.now())
+        [claimed] = first.claim()
+        assert second.claim() == []
+        # The first worker stalls past its claim timeout; the second takes over
+        Task.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        [taken] = second.claim()
+        assert taken.attempts == 3 > taken.max_attempts
+        assert first.execute(claimed)
+        first.finish([claimed])
+        assert Task.objects.filter(pk=queued.pk, locked_by=taken.locked_by).exists()
+        assert not second.execute(taken)
+        assert Task.objects.get(pk=queued.pk).status == "failed"
+        assert calls == [1, 1]
+
+
+@pytest.mark.django_db
+class TestNoteArchive:
+    """Stale notes move to the compressed archive, stay readable, and come back when edited."""
+
+    def _old_notes(self):
+        from datetime import timedelta
+        from io import StringIO
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from notes.models import Note
+
+        user = User.objects.create_user("archivist", password="x")
+        stale = Note.objects.create(title="Old", content="long forgotten " * 50, author=user)
+        Note.objects.create(title="New", content="fresh", author=user)
+        two_years_ago = timezone.now() - timedelta(days=730)
+        Note.objects.filter(pk=stale.pk).update(created_at=two_years_ago, updated_at=two_years_ago)
+        management.call_command("archive_notes", "--delay", "0", stdout=StringIO())
+        return user, stale, two_years_ago
+
+    def test_archived_notes_stay_readable(self, client):
+        import zlib
+        from notes.models import ArchivedNote, Note
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        user, stale, _ = self._old_notes()
+        assert list(Note.objects.values_list("title", flat=True)) == ["New"]
+        archived = ArchivedNote.objects.get(pk=stale.pk)
+        assert len(archived.content) < len(stale.content)
+        assert zlib.decompress(archived.content).decode() == stale.content
+
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        listed = client.get(reverse("drf_note_list"), **auth).json()
+        assert [note["title"] for note in listed] == ["New", "Old"]
+        detail = client.get(reverse("drf_note_detail", args=[stale.pk]), **auth)
+        assert detail.status_code == 200 and detail.json()["content"] == stale.content
+        assert ArchivedNote.objects.filter(pk=stale.pk).exists()
+
+        client.force_login(user)
+        page = client.get(reverse("note_list"))
+        assert b"Old" in page.content and b"New" in page.content
+        assert client.get(reverse("note_update", args=[stale.pk])).status_code == 200
+
+    def test_editing_restores_and_purge_removes_archive(self, client):
+        from notes.models import ArchivedNote, Note, NoteSignature
+        from notes.archive import archive_stale_notes
+        from notes.purge import run_purge, schedule_user_purge
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        user, stale, two_years_ago = self._old_notes()
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+        resp = client.put(
+            reverse("drf_note_detail", args=[stale.pk]),
+            json.dumps({"title": "Old, revived", "content": "edited"}), content_type="application/json", **auth,
+        )
+        assert resp.status_code == 200
+        restored = Note.objects.get(pk=stale.pk)
+        assert (restored.title, restored.content, restored.created_at) == ("Old, revived", "edited", two_years_ago)
+        assert restored.updated_at > two_years_ago
+        assert NoteSignature.objects.filter(note=restored).exists()
+        assert not ArchivedNote.objects.exists()
+
+        Note.objects.filter(pk=stale.pk).update(updated_at=two_years_ago)
+        assert archive_stale_notes(delay=0) == 1
+        purge = run_purge(schedule_user_purge(user), delay=0)
+        assert purge.notes_deleted == 2
+        assert not ArchivedNote.objects.exists() and not Note.objects.exists()
+
+
 class TestHealth:
     """Basic smoke tests to ensure the app responds without server error."""
 